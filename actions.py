@@ -7,7 +7,7 @@ from typing import TYPE_CHECKING
 from logs import log
 from resource import Resource
 from dev_cards import DevCard
-from construction import Construction, ConstructionKind, NUM_CONSTRUCTION_MAX
+from construction import ConstructionKind, NUM_CONSTRUCTION_MAX
 from resource_hand_count import ResourceHandCount
 
 if TYPE_CHECKING:
@@ -43,28 +43,9 @@ class ActionBuildRoad(Action):
         self.player.consume_resources(self.cost)
 
     def available(self):
-        # path is occupied
-        if self.path.road_player is not None:
-            return False
-
         if self.player.num_roads_belonging_to_player() >= NUM_CONSTRUCTION_MAX[ConstructionKind.ROAD]:
             return False
-
-        # check if there is one of our colony/town around it
-        def has_own_construction(intersection: TileIntersection):
-            return intersection.content is not None and intersection.content.player == self.player
-
-        if has_own_construction(self.path.intersections[0]) or \
-                has_own_construction(self.path.intersections[1]):
-            return True
-
-        # check if there is one of our road around it
-        adjacent_paths = self.path.intersections[0].neighbour_paths + self.path.intersections[1].neighbour_paths
-        for p in adjacent_paths:
-            if p.road_player == self.player:
-                return True
-
-        return False
+        return self.path in self.player.road_frontier
 
 
 @dataclass
@@ -81,17 +62,9 @@ class ActionBuildColony(Action):
         self.player.consume_resources(self.cost)
 
     def available(self):
-        if not self.intersection.can_build():
-            return False
-
         if self.player.num_colonies_belonging_to_player() >= NUM_CONSTRUCTION_MAX[ConstructionKind.COLONY]:
             return False
-
-        # check if there is one of our road around it
-        for p in self.intersection.neighbour_paths:
-            if p.road_player == self.player:
-                return True
-        return False
+        return self.intersection in self.player.colony_frontier
 
 
 @dataclass
@@ -101,7 +74,7 @@ class ActionBuildTown(Action):
     cost = ResourceHandCount({Resource.ROCK: 3, Resource.HAY: 2})
 
     def apply(self):
-        if not self.intersection.content == Construction(kind=ConstructionKind.COLONY, player=self.player):
+        if self.intersection not in self.player.colonies:
             raise ValueError("the town must be built on one of our colony")
         log(f"Action: {self.player} build a town.")
         self.player.add_town(self.intersection)
@@ -110,7 +83,7 @@ class ActionBuildTown(Action):
     def available(self):
         if self.player.num_towns_belonging_to_player() >= NUM_CONSTRUCTION_MAX[ConstructionKind.TOWN]:
             return False
-        return self.intersection.content == Construction(kind=ConstructionKind.COLONY, player=self.player)
+        return self.intersection in self.player.colonies
 
 
 @dataclass
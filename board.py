@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import random
+import numpy as np
 import pygame
-from random import shuffle
 from typing import TYPE_CHECKING
 
-from resource import Resource, BOARD_PORT_INDEXES_PATHS, BOARD_PORT_DIRECTION
+from resource import Resource, ORDER_RESOURCES, ORDER_PORTS, BOARD_PORT_INDEXES_PATHS, BOARD_PORT_DIRECTION
 from dev_cards import DevCard, NUM_DEV_CARDS
 from resource_manager import ResourceManager
-from constants import LIST_TILES_COORDS, LIST_TILES_INTERSECTIONS_COORDS, THIEF_INITIAL_TILE, SIZE_MIN_LARGEST_ARMY
+from constants import THIEF_INITIAL_TILE
+from construction import Construction, ConstructionKind
+from probability import get_probability_to_roll
+from board_topology import BoardTopology, get_board_topology
+from board_state import BoardState, NO_PLAYER, NO_CONSTRUCTION
 from tile import Tile
 from tile_intersection import TileIntersection
 from tile_path import TilePath
@@ -18,22 +23,166 @@ if TYPE_CHECKING:
 
 class Board:
     def __init__(self, list_tiles_resources: list[Resource], list_tiles_dice_numbers: list[int],
-                 list_ports_resources: list[Resource]):
+                 list_ports_resources: list[Resource], rng: random.Random | None = None,
+                 np_rng: np.random.Generator | None = None):
+        self.rng = random.Random() if rng is None else rng
+        self.np_rng = np.random.default_rng() if np_rng is None else np_rng
+
+        self.topology: BoardTopology = get_board_topology()
         self.tiles: list[Tile] = []
         self.paths: list[TilePath] = []
         self.intersections: list[TileIntersection] = []
 
         self.create_bord(list_tiles_resources, list_tiles_dice_numbers, list_ports_resources)
-
-        self.thief_tile: Tile = self.tiles[THIEF_INITIAL_TILE]
+        # Static values of the intersections, the columns in the order of ORDER_RESOURCES / ORDER_PORTS
+        self.intersection_expectations = self._compute_intersection_expectations()
+        self.intersection_ports = self._compute_intersection_ports()
+
+        self.state = BoardState(len(self.intersections), len(self.paths), THIEF_INITIAL_TILE)
+        self.version = 0  # Incremented at each change of a construction or a road
+        # Distance rule: number of constructions on each intersection and its neighbours (0 if we can build on it)
+        self.num_close_constructions = np.zeros(len(self.intersections), dtype=np.int8)
+        # production[dice_number][(player, resource)]: what the players get when the dice number is rolled
+        self.production: dict[int, dict[tuple[Player, Resource], int]] = {n: {} for n in range(2, 13)}
+        self.players: list[Player] = []
+        # constructions[kind.value][player.index]: the contents of the intersections are shared
+        self.constructions: list[list[Construction]] = [[], [], []]
 
         self.dev_cards: list[DevCard] = sum([[card for _ in range(num)] for card, num in NUM_DEV_CARDS.items()],
                                             start=[])
-        shuffle(self.dev_cards)
+        self.rng.shuffle(self.dev_cards)
 
         self.players_longest_road: list[Player] = []
         self.player_largest_army: Player | None = None
 
+    def _compute_intersection_expectations(self) -> np.ndarray:
+        # Expected number of cards of each resource produced by a colony on the intersection at each turn
+        expectations = np.zeros((len(self.intersections), len(ORDER_RESOURCES)))
+        for inter in self.intersections:
+            for tile in inter.neighbour_tiles:
+                if tile.resource == Resource.DESERT:
+                    continue
+                expectations[inter.index, ORDER_RESOURCES.index(tile.resource)] += \
+                    get_probability_to_roll(tile.dice_number)
+        expectations.flags.writeable = False
+        return expectations
+
+    def _compute_intersection_ports(self) -> np.ndarray:
+        # Number of ports of each kind on the paths around the intersection
+        ports = np.zeros((len(self.intersections), len(ORDER_PORTS)))
+        for inter in self.intersections:
+            for path in inter.neighbour_paths:
+                if path.port is not None:
+                    ports[inter.index, ORDER_PORTS.index(path.port.resource)] += 1
+        ports.flags.writeable = False
+        return ports
+
+    def add_player(self, player: Player) -> int:
+        index = len(self.players)
+        self.players.append(player)
+        self.constructions[ConstructionKind.COLONY.value].append(Construction(ConstructionKind.COLONY, player))
+        self.constructions[ConstructionKind.TOWN.value].append(Construction(ConstructionKind.TOWN, player))
+        return index
+
+    @property
+    def thief_tile(self) -> Tile:
+        return self.tiles[self.state.thief]
+
+    @thief_tile.setter
+    def thief_tile(self, tile: Tile):
+        self._update_production_of_tile(self.thief_tile, 1)
+        self._update_production_of_tile(tile, -1)
+        self.state.thief = tile.index
+
+    def get_construction(self, intersection: TileIntersection) -> Construction | None:
+        # item() gives Python ints: much faster than numpy scalars for a single value
+        kind = self.state.intersection_kind.item(intersection.index)
+        if kind == NO_CONSTRUCTION:
+            return None
+        return self.constructions[kind][self.state.intersection_owner.item(intersection.index)]
+
+    def set_construction(self, intersection: TileIntersection, construction: Construction | None):
+        # Every change of the board goes through here (even the fake ones of the strategies): keep the indexes in sync
+        self.version += 1
+        old_construction = self.get_construction(intersection)
+        if old_construction is not None:
+            old_construction.player.unregister_construction(intersection, old_construction.kind)
+            self._update_production_of_intersection(intersection, old_construction, -1)
+        if construction is None:
+            self.state.intersection_kind[intersection.index] = NO_CONSTRUCTION
+            self.state.intersection_owner[intersection.index] = NO_PLAYER
+        else:
+            self.state.intersection_kind[intersection.index] = construction.kind.value
+            self.state.intersection_owner[intersection.index] = construction.player.index
+            construction.player.register_construction(intersection, construction.kind)
+            self._update_production_of_intersection(intersection, construction, 1)
+
+        # The distance rule: the colonies around can have changed for everyone
+        close_intersections = [intersection] + [inter for _, inter in intersection.neighbour_paths_intersection()]
+        if (old_construction is None) != (construction is None):
+            self.num_close_constructions[[inter.index for inter in close_intersections]] += \
+                1 if old_construction is None else -1
+        for player in self.players:
+            player.update_frontiers([], close_intersections)
+        for old_or_new_construction in (old_construction, construction):
+            if old_or_new_construction is not None:
+                old_or_new_construction.player.update_frontiers(intersection.neighbour_paths, [])
+
+    def can_build(self, intersection: TileIntersection) -> bool:
+        return self.num_close_constructions.item(intersection.index) == 0
+
+    def buildable_intersections(self) -> list[TileIntersection]:
+        return [self.intersections[i] for i in np.flatnonzero(self.num_close_constructions == 0)]
+
+    def get_road_player(self, path: TilePath) -> Player | None:
+        owner = self.state.path_owner.item(path.index)
+        if owner == NO_PLAYER:
+            return None
+        return self.players[owner]
+
+    def set_road_player(self, path: TilePath, player: Player | None):
+        self.version += 1
+        old_player = self.get_road_player(path)
+        if old_player is not None:
+            old_player.unregister_road(path)
+        if player is None:
+            self.state.path_owner[path.index] = NO_PLAYER
+        else:
+            self.state.path_owner[path.index] = player.index
+            player.register_road(path)
+
+        for p in self.players:
+            p.update_frontiers([path], [])
+        for old_or_new_player in (old_player, player):
+            if old_or_new_player is not None:
+                old_or_new_player.update_frontiers(
+                    path.intersections[0].neighbour_paths + path.intersections[1].neighbour_paths, path.intersections)
+
+    def _add_production(self, dice_number: int, player: Player, resource: Resource, num: int):
+        production = self.production[dice_number]
+        num += production.get((player, resource), 0)
+        if num == 0:
+            del production[(player, resource)]
+        else:
+            production[(player, resource)] = num
+
+    def _update_production_of_intersection(self, intersection: TileIntersection, construction: Construction,
+                                           sign: int):
+        # A colony produces 1 resource, a town 2
+        for tile in intersection.neighbour_tiles:
+            if tile.resource == Resource.DESERT or tile.index == self.state.thief:
+                continue
+            self._add_production(tile.dice_number, construction.player, tile.resource, sign * construction.kind.value)
+
+    def _update_production_of_tile(self, tile: Tile, sign: int):
+        if tile.resource == Resource.DESERT:
+            return
+        for intersection in tile.intersections:
+            construction = intersection.content
+            if construction is not None:
+                self._add_production(tile.dice_number, construction.player, tile.resource,
+                                     sign * construction.kind.value)
+
     def update_longest_road(self, player: 'Player'):
         lr = self.players_longest_road
         bonus = 1 if player == self.players_longest_road[0] else 0
@@ -51,47 +200,24 @@ class Board:
 
     def create_bord(self, list_tiles_resources: list[Resource], list_tiles_dice_numbers: list[int],
                     list_ports_resources: list[Resource]):
-        def find_intersection(x, y):
-            for intersection in self.intersections:
-                if (intersection.x, intersection.y) == (x, y):
-                    return intersection
-            return None
-
-        def create_path(inter1, inter2):
-            path = TilePath([inter1, inter2])
-            inter1.add_neighbour_path(path)
-            inter2.add_neighbour_path(path)
-            self.paths.append(path)
-
-        for (i, j), res, num in zip(LIST_TILES_COORDS, list_tiles_resources, list_tiles_dice_numbers):
-            tile = Tile(res, i, j, num)
+        topology = self.topology
+        self.intersections = [TileIntersection(self, index, x, y)
+                              for index, (x, y) in enumerate(topology.intersections_coords)]
+        for index, ((i, j), res, num) in enumerate(zip(topology.tiles_coords, list_tiles_resources,
+                                                        list_tiles_dice_numbers)):
+            tile = Tile(res, i, j, num, index=index)
             self.tiles.append(tile)
-            first_inter = None
-            first_inter_exists = True
-            previous_inter = None
-            previous_inter_exists = False
-            for di, dj in LIST_TILES_INTERSECTIONS_COORDS:
-                assert i + di >= 0
-                assert j + dj >= 0
-                inter = find_intersection(i + di, j + dj)
-                inter_exists = inter is not None
-                if not inter_exists:
-                    inter = TileIntersection(i + di, j + dj)
-                    self.intersections.append(inter)
-                    if first_inter is None:
-                        first_inter_exists = False
-                inter.add_neighbour_tile(tile)
-                if first_inter is None:
-                    first_inter = inter
-                if previous_inter is not None and not (inter_exists and previous_inter_exists):
-                    create_path(inter, previous_inter)
-                tile.add_intersection(inter)
-                previous_inter = inter
-                previous_inter_exists = inter_exists
-            if not (previous_inter_exists and first_inter_exists):
-                create_path(first_inter, previous_inter)
+            for inter in topology.tile_intersections[index]:
+                tile.add_intersection(self.intersections[inter])
+                self.intersections[inter].add_neighbour_tile(tile)
+        for index, (inter1, inter2) in enumerate(topology.path_intersections):
+            path = TilePath(self, index, [self.intersections[inter1], self.intersections[inter2]])
+            self.intersections[inter1].add_neighbour_path(path)
+            self.intersections[inter2].add_neighbour_path(path)
+            self.paths.append(path)
         for index, resource, direction in zip(BOARD_PORT_INDEXES_PATHS, list_ports_resources, BOARD_PORT_DIRECTION):
             self.paths[index].add_port(resource, direction)
+        self.port_paths: list[TilePath] = [self.paths[index] for index in BOARD_PORT_INDEXES_PATHS]
 
     def mouse_on_intersection(self, x0: int, y0: int, x_mouse: int, y_mouse: int) -> TileIntersection | None:
         for inter in self.intersections:
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import numpy as np
+
+NO_PLAYER = -1
+NO_CONSTRUCTION = 0  # Otherwise the value of the ConstructionKind (which is also its number of victory points)
+
+
+class BoardState:
+    """
+    All the mutable state of a Board, the players being identified by their index
+    """
+
+    def __init__(self, num_intersections: int, num_paths: int, thief: int):
+        self.intersection_owner = np.full(num_intersections, NO_PLAYER, dtype=np.int8)
+        self.intersection_kind = np.full(num_intersections, NO_CONSTRUCTION, dtype=np.int8)
+        self.path_owner = np.full(num_paths, NO_PLAYER, dtype=np.int8)
+        self.thief = thief
+
+    def get_key(self) -> bytes:
+        # Equal for equal states, to be used as a dict key
+        return self.intersection_owner.tobytes() + self.intersection_kind.tobytes() + self.path_owner.tobytes() + \
+            self.thief.to_bytes(1, "little")
+
+    def copy(self) -> BoardState:
+        state = BoardState.__new__(BoardState)
+        state.intersection_owner = self.intersection_owner.copy()
+        state.intersection_kind = self.intersection_kind.copy()
+        state.path_owner = self.path_owner.copy()
+        state.thief = self.thief
+        return state
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from constants import LIST_TILES_COORDS, LIST_TILES_INTERSECTIONS_COORDS
+
+
+@dataclass(frozen=True, eq=False)
+class BoardTopology:
+    """
+    Tiles, intersections and paths are identified by their index in the lists of the Board
+    """
+    tiles_coords: tuple[tuple[int, int], ...]
+    intersections_coords: tuple[tuple[int, int], ...]
+
+    tile_intersections: tuple[tuple[int, ...], ...]
+    path_intersections: tuple[tuple[int, int], ...]
+
+
+@lru_cache
+def get_board_topology(tiles_coords: tuple[tuple[int, int], ...] = tuple(LIST_TILES_COORDS),
+                       tile_intersections_coords: tuple[tuple[int, int], ...] = tuple(LIST_TILES_INTERSECTIONS_COORDS)) \
+        -> BoardTopology:
+    intersections_coords: list[tuple[int, int]] = []
+    intersections_indexes: dict[tuple[int, int], int] = {}
+    tile_intersections: list[list[int]] = []
+    path_intersections: list[tuple[int, int]] = []
+
+    # Same order as the first version of Board.create_bord: the ports and the saved networks rely on it
+    for tile, (i, j) in enumerate(tiles_coords):
+        tile_intersections.append([])
+        first_inter = None
+        first_inter_exists = True
+        previous_inter = None
+        previous_inter_exists = False
+        for di, dj in tile_intersections_coords:
+            assert i + di >= 0
+            assert j + dj >= 0
+            inter = intersections_indexes.get((i + di, j + dj))
+            inter_exists = inter is not None
+            if not inter_exists:
+                inter = len(intersections_coords)
+                intersections_indexes[(i + di, j + dj)] = inter
+                intersections_coords.append((i + di, j + dj))
+                if first_inter is None:
+                    first_inter_exists = False
+            if first_inter is None:
+                first_inter = inter
+            if previous_inter is not None and not (inter_exists and previous_inter_exists):
+                path_intersections.append((inter, previous_inter))
+            tile_intersections[tile].append(inter)
+            previous_inter = inter
+            previous_inter_exists = inter_exists
+        if not (previous_inter_exists and first_inter_exists):
+            path_intersections.append((first_inter, previous_inter))
+
+    return BoardTopology(
+        tiles_coords=tuple(tiles_coords),
+        intersections_coords=tuple(intersections_coords),
+        tile_intersections=tuple(map(tuple, tile_intersections)),
+        path_intersections=tuple(path_intersections)
+    )
@@ -1,6 +1,7 @@
 
 from dataclasses import dataclass
-from resource_hand_count import ResourceHandCount
+from functools import lru_cache
+from resource_hand_count import ResourceHandCount, get_all_possible_set_of_resources, get_bounded_compositions
 from typing import TYPE_CHECKING
 
 from logs import log
@@ -39,3 +40,17 @@ class Exchange:
 
     def ratio(self):
         return sum(self.gain.values()) / sum(self.lost.values())
+
+
+@lru_cache(maxsize=1024)
+def get_bank_exchanges(max_lost: tuple[int, ...], rates: tuple[int, ...]) \
+        -> tuple[tuple[tuple[int, ...], tuple[int, ...]], ...]:
+    # max_lost: number of times each resource can be given (cards // rate), in the order of ORDER_RESOURCES
+    # Returns the (gain, lost) counts, a resource never being both given and received
+    exchanges = []
+    for i in range(1, 1 + sum(max_lost)):
+        for gain in get_all_possible_set_of_resources(i):
+            bounds = tuple(0 if num_gain > 0 else num for num, num_gain in zip(max_lost, gain.counts))
+            for lost in get_bounded_compositions(bounds, i):
+                exchanges.append((tuple(gain.counts), tuple(num * rate for num, rate in zip(lost, rates))))
+    return tuple(exchanges)
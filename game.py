@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 import random
+import time
+from dataclasses import dataclass
+
+import numpy as np
 
 from logs import log
 from constants import NUM_VICTORY_POINTS_FOR_VICTORY
@@ -8,22 +12,39 @@ from dev_cards import DevCard
 from resource import BOARD_LAYOUT_DICE_NUMBERS, BOARD_LAYOUT_RESOURCES, BOARD_PORT_RESOURCES
 from board import Board
 from color import COLORS_ORDER
-from construction import ConstructionKind
 from player import Player, PlayerManager
 from exchange import BANK_PLAYER_FOR_EXCHANGE
 from game_states import GameState, GamePlayingState, GamePlacingColoniesState
 
 
+@dataclass
+class GameResult:
+    seed: int
+    winner: int | None
+    num_turns: int
+    victory_points: list[int]
+    wall_time: float = 0.
+
+
 class Game:
     board: Board
     players: list[Player]
 
-    def __init__(self, nicknames: list[str]):
-        self.board = Board(BOARD_LAYOUT_RESOURCES, BOARD_LAYOUT_DICE_NUMBERS, BOARD_PORT_RESOURCES)
+    def __init__(self, nicknames: list[str], seed: int | None = None):
+        # Every random draw of the game comes from these generators: the game can be replayed from its seed
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+
+        self.board = Board(BOARD_LAYOUT_RESOURCES, BOARD_LAYOUT_DICE_NUMBERS, BOARD_PORT_RESOURCES,
+                           self.rng, self.np_rng)
         self.players = [
             Player(nickname, COLORS_ORDER[i], self.board) for i, nickname in enumerate(nicknames)
         ]
         self.turn_number = 0
+        self.num_victory_points_for_victory = NUM_VICTORY_POINTS_FOR_VICTORY
 
         self.dices = (0, 0)
 
@@ -81,6 +102,87 @@ class Game:
                 if player_managers[current_player].steal_card():
                     self.game_sub_state = GamePlayingState.NEXT_TURN
 
+    def run_to_end(self, player_managers: dict[Player, PlayerManager], num_turns_max: int | None = None,
+                   num_victory_points_for_victory: int | None = None) -> GameResult:
+        # For player managers playing each step at once (IaPlayer): whole turns are played without going back
+        # through play for each sub-state
+        start = time.perf_counter()
+        if num_victory_points_for_victory is not None:
+            self.num_victory_points_for_victory = num_victory_points_for_victory
+        while not self.game_state == GameState.END:
+            if num_turns_max is not None and self.turn_number >= num_turns_max:
+                break
+            if self.game_state == GameState.PLAYING and self.game_sub_state == GamePlayingState.THROW_DICES:
+                self._run_turn(player_managers)
+            elif self.game_state == GameState.PLAYING and self.game_sub_state == GamePlayingState.NEXT_TURN:
+                self._run_next_turn_states(player_managers)
+            else:
+                state = (self.game_state, self.game_sub_state, self.turn_number)
+                self.play(player_managers)
+                _check_step_done(state != (self.game_state, self.game_sub_state, self.turn_number))
+        result = self.get_result()
+        result.wall_time = time.perf_counter() - start
+        return result
+
+    def _run_turn(self, player_managers: dict[Player, PlayerManager]):
+        current_player = self.get_current_player()
+        player_manager = player_managers[current_player]
+        dev_card_in_action = current_player.dev_card_in_action
+        while self._knight_before_playing(player_managers):
+            _check_step_done(current_player.dev_card_in_action != dev_card_in_action)
+            dev_card_in_action = current_player.dev_card_in_action
+
+        _check_step_done(player_manager.throw_dice())
+        self.throw_dice()
+        if sum(self.dices) == 7:
+            for player in self.players:
+                player.move_thief_match_num_cards()
+            for player in self.players:
+                if player.num_cards_to_remove_for_thief > 0:
+                    _check_step_done(player_managers[player].remove_cards_for_thief())
+            _check_step_done(player_manager.move_thief())
+            if current_player.can_steal():
+                _check_step_done(player_manager.steal_card())
+        else:
+            _check_step_done(player_manager.get_resources())
+            self.get_resources()
+
+        self.game_sub_state = GamePlayingState.NEXT_TURN
+        self._run_next_turn_states(player_managers)
+
+    def _run_next_turn_states(self, player_managers: dict[Player, PlayerManager]):
+        current_player = self.get_current_player()
+        while self.game_sub_state == GamePlayingState.NEXT_TURN and not self.game_state == GameState.END:
+            self._run_exchanges(player_managers)
+            dev_card_in_action = current_player.dev_card_in_action
+            self._play_next_turn_state(player_managers)
+            # Still the same turn: new exchanges to propose, or a step of a dev card played
+            if self.game_sub_state == GamePlayingState.NEXT_TURN and not self.game_state == GameState.END and \
+                    not current_player.exchanges:
+                _check_step_done(current_player.dev_card_in_action != dev_card_in_action)
+
+    def _run_exchanges(self, player_managers: dict[Player, PlayerManager]):
+        # Same as the exchanges part of _play_next_turn_state, but all the proposals are answered at once
+        current_player = self.get_current_player()
+        while current_player.exchanges:
+            exchange = current_player.exchanges.pop(0)
+            if current_player.can_exchange_with_the_bank(exchange):
+                exchange.apply(current_player, BANK_PLAYER_FOR_EXCHANGE)
+                current_player.exchanges = None
+                return
+            for player in self.get_non_current_players():
+                player.ask_for_exchange(exchange.inverse())
+            for player in self.get_non_current_players():
+                if player.exchange_asked is None:
+                    continue
+                _check_step_done(player_managers[player].accept_exchange())
+                if player.exchange_accepted:
+                    player.exchange_asked.apply(player, current_player)
+                    current_player.exchanges = None
+                    for p in self.get_non_current_players():
+                        p.exchange_asked_done()
+                    return
+
     def _knight_before_playing(self, player_managers: dict[Player, PlayerManager]):
         current_player = self.get_current_player()
         if current_player.dev_card_in_action is not None:
@@ -168,7 +270,7 @@ class Game:
         if player_managers[current_player].play():
             current_player.exchanges = None
             current_player.end_turn()
-            if current_player.num_victory_points() >= NUM_VICTORY_POINTS_FOR_VICTORY:
+            if current_player.num_victory_points() >= self.num_victory_points_for_victory:
                 self.game_state = GameState.END
             else:
                 self.game_sub_state = GamePlayingState.THROW_DICES
@@ -176,20 +278,20 @@ class Game:
 
     def throw_dice(self):
         log(f"\nPlayer turn: {self.get_current_player()}")
-        self.dices = (random.randint(1, 6), random.randint(1, 6))
+        self.dices = (self.rng.randint(1, 6), self.rng.randint(1, 6))
 
     def get_resources(self):
         r = sum(self.dices)
         assert not r == 7
         # Give resources to players
-        for tile in self.board.tiles:
-            if tile.dice_number == r and not tile == self.board.thief_tile:
-                for inte in tile.intersections:
-                    if inte.content is None:
-                        continue
-                    inte.content.player.add_one_resource(tile.resource)
-                    if inte.content.kind == ConstructionKind.TOWN:
-                        inte.content.player.add_one_resource(tile.resource)
+        for (player, resource), num in self.board.production[r].items():
+            player.add_one_resource(resource, num)
+
+    def get_result(self) -> GameResult:
+        winner = None
+        if self.game_state == GameState.END:
+            winner = self.players.index(self.get_current_player())
+        return GameResult(self.seed, winner, self.turn_number, [player.num_victory_points() for player in self.players])
 
     def get_current_player(self) -> Player:
         if self.game_state == GameState.PLACING_COLONIES:
@@ -205,3 +307,8 @@ class Game:
     def get_players_except_one(self, player: Player) -> list[Player]:
         index = self.players.index(player)
         return self.players[:index] + self.players[index + 1:]
+
+
+def _check_step_done(done: bool):
+    if not done:
+        raise RuntimeError("Game.run_to_end needs player managers playing each step at once")
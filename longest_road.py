@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from player import Player
+    from tile_intersection import TileIntersection
+    from tile_path import TilePath
+
+
+class RoadComponent:
+    def __init__(self, paths: set[TilePath]):
+        self.paths = paths
+        self.length: int | None = None  # None while it has not been computed since the last change
+
+
+class LongestRoad:
+    """
+    The roads of a player, split in connected components (the colonies of the other players cut the roads).
+    Only the components touched by a change are recomputed, and only when they can be the longest one.
+    """
+
+    def __init__(self, player: Player):
+        self.player = player
+        self.components: dict[TilePath, RoadComponent] = {}
+
+    def add_road(self, path: TilePath):
+        paths = {path}
+        for inter in path.intersections:
+            if not self._can_go_through(inter):
+                continue
+            for neighbour_path in inter.neighbour_paths:
+                component = self.components.get(neighbour_path)
+                if component is not None:
+                    paths |= component.paths
+        self._set_component(paths)
+
+    def cut(self, intersection: TileIntersection):
+        # A colony of another player has been built on the intersection
+        components = [self.components[path] for path in intersection.neighbour_paths if path in self.components]
+        for component in components:
+            if components.count(component) < 2:
+                continue
+            remaining_paths = set(component.paths)
+            while remaining_paths:
+                start = remaining_paths.pop()
+                paths = {start}
+                stack = [start]
+                while stack:
+                    for inter in stack.pop().intersections:
+                        if not self._can_go_through(inter):
+                            continue
+                        for path in inter.neighbour_paths:
+                            if path in remaining_paths:
+                                remaining_paths.remove(path)
+                                paths.add(path)
+                                stack.append(path)
+                self._set_component(paths)
+
+    def get_length(self) -> int:
+        best_length = 0
+        components_to_compute = []
+        for component in set(self.components.values()):
+            if component.length is None:
+                components_to_compute.append(component)
+            else:
+                best_length = max(best_length, component.length)
+        # The number of roads of a component is an upper bound of its length: the components which cannot beat the
+        # best known length are not searched (their length stays to compute)
+        components_to_compute.sort(key=lambda c: len(c.paths), reverse=True)
+        for component in components_to_compute:
+            if len(component.paths) <= best_length:
+                break
+            component.length = self._compute_length(component.paths)
+            best_length = max(best_length, component.length)
+        return best_length
+
+    def _set_component(self, paths: set[TilePath]):
+        component = RoadComponent(paths)
+        for path in paths:
+            self.components[path] = component
+
+    def _can_go_through(self, intersection: TileIntersection) -> bool:
+        content = intersection.content
+        return content is None or content.player == self.player
+
+    def _compute_length(self, paths: set[TilePath]) -> int:
+        def get_all_possible_length_from_intersection(intersection: TileIntersection, remaining_paths: set[TilePath]):
+            if len(remaining_paths) == 0:
+                return 0
+            better_length = 0
+            for path in intersection.neighbour_paths:
+                if path in remaining_paths:
+                    next_intersection = path.intersections[1 if path.intersections[0] == intersection else 0]
+                    length = 1
+                    if self._can_go_through(next_intersection):
+                        remaining_paths.remove(path)
+                        length += get_all_possible_length_from_intersection(next_intersection, remaining_paths)
+                        remaining_paths.add(path)
+                    better_length = max(length, better_length)
+            return better_length
+
+        remaining = set(paths)
+        intersections = {inter for path in paths for inter in path.intersections}
+        return max(get_all_possible_length_from_intersection(inter, remaining) for inter in intersections)
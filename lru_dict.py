@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUDict(Generic[V]):
+    """
+    A dict keeping only the maxsize last used keys
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.values: OrderedDict[Hashable, V] = OrderedDict()
+
+    def get(self, key: Hashable, default: V | None = None) -> V | None:
+        value = self.values.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.values.move_to_end(key)
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.values
+
+    def __setitem__(self, key: Hashable, value: V):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def clear(self):
+        self.values.clear()
@@ -18,7 +18,6 @@ if __name__ == "__main__":
     play_against_computer = True
     ia_play_with_space = False
 
-    # random.seed(1)
     pygame.init()
     clock = pygame.time.Clock()
 
@@ -9,7 +9,7 @@ from rendering_constants import *
 from rendering_functions import alpha_image, render_road
 from resource_hand_count import ResourceHandCount, ORDER_RESOURCES
 from resource_manager import ResourceManager
-from construction import Construction, ConstructionKind
+from construction import ConstructionKind
 from actions import Action, ActionBuildRoad, ActionBuildColony, ActionBuildTown, ActionBuyDevCard, ActionRevealDevCard
 from player import Player, PlayerManager
 from exchange import Exchange, BANK_PLAYER_FOR_EXCHANGE
@@ -137,10 +137,9 @@ class ManualPlayer(PlayerManager):
             if not res == list_cards[i]:
                 return
 
-        ports = self.player.get_ports()
-        if len(self.selected_cards) == 2 and res not in ports:
+        if len(self.selected_cards) == 2 and not self.player.exchange_rates[res] == 2:
             return
-        if Resource.P_3_FOR_1 in ports:
+        if Resource.P_3_FOR_1 in self.player.ports:
             if len(self.selected_cards) == 4:
                 return
         else:
@@ -171,7 +170,7 @@ class ManualPlayer(PlayerManager):
         path = self.player.board.mouse_on_path(X_BOARD, Y_BOARD, x, y)
         if path is not None and path.road_player is None:
             for inter in path.intersections:
-                if inter.content == Construction(ConstructionKind.COLONY, self.player):
+                if inter in self.player.colonies:
                     for p in inter.neighbour_paths:
                         if p.road_player is not None:
                             return False
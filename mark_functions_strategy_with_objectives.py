@@ -2,10 +2,11 @@
 from __future__ import annotations
 
 from typing import TYPE_CHECKING
+import numpy as np
 from tile_intersection import TileIntersection
 from tile import Tile
 from probability import get_probability_to_roll
-from resource import Resource
+from resource import Resource, ORDER_RESOURCES, ORDER_PORTS
 from resource_hand_count import ResourceHandCount
 from construction import ConstructionKind
 
@@ -53,16 +54,28 @@ def mark_objective(player: Player, cost_no_modify: ResourceHandCount, initial_ga
     return gain ** 2 / (cost_num_turns + 1)
 
 
+def mark_objective_for_hands(player: Player, cost: ResourceHandCount, initial_gain: float,
+                             hands: np.ndarray) -> np.ndarray:
+    # The same as mark_objective, for each of the hands (one per row) instead of the hand of the player
+    prod_turns = player.get_resource_production_in_number_of_turns_with_systematic_exchange(with_thief=True)
+    prod_turns = np.array([prod_turns[res] for res in ORDER_RESOURCES])
+    cost_num_turns = player.get_number_of_turns_to_afford(hands, cost, with_thief=True)
+
+    expectation = player.get_resource_production_expectation_with_thief()
+    expectation = np.array([expectation[res] for res in ORDER_RESOURCES])
+    hands_after_cost_num_turns = hands + np.outer(cost_num_turns, expectation) - cost.counts
+
+    marks_resources = np.array([mark_resource(player, res) for res in ORDER_RESOURCES])
+    gain = 150 * initial_gain + hands_after_cost_num_turns @ (prod_turns * marks_resources) + 100
+    gain = np.maximum(gain, 0)
+    return gain ** 2 / (cost_num_turns + 1)
+
+
 def mark_resource(player: Player, resource: Resource):
     if resource == Resource.DESERT:
         return 0
-    ports = list(player.get_ports())
-    c = 80
-    if resource in ports:
-        c = 40
-    elif Resource.P_3_FOR_1 in ports:
-        c = 60
-    return (1 if Resource.P_3_FOR_1 in ports else 0.95) / \
+    c = 20 * player.exchange_rates[resource]  # 40 with a 2 for 1 port, 60 with a 3 for 1 port, 80 otherwise
+    return (1 if Resource.P_3_FOR_1 in player.ports else 0.95) / \
            ((1 + c * player.production_expectation[resource]) ** 0.6)
 
 
@@ -80,30 +93,35 @@ def mark_port(player: Player, resource: Resource, special_expectation: float = N
 
 def mark_resource_expectation(player: Player, resource: Resource, expectation: float):
     mark = expectation * mark_resource(player, resource)
-    if resource in player.get_ports():
+    if player.exchange_rates[resource] == 2:
         mark += mark_port(player, resource, special_expectation=expectation)
     return mark
 
 
-def mark_intersection(player: Player, intersection: TileIntersection):
-    ports = list(player.get_ports())
-    mark = 0
-    for tile in intersection.neighbour_tiles:
-        if tile.resource == Resource.DESERT:
-            continue
-        expectation = get_probability_to_roll(tile.dice_number)
-        mark += mark_resource_expectation(player, tile.resource, expectation)
-    for path in intersection.neighbour_paths:
-        if path.port is not None and path.port.resource not in ports:
-            if path.port.resource == Resource.P_3_FOR_1:
-                mark += mark_port(player, path.port.resource)
+def mark_intersection(player: Player, intersection: TileIntersection) -> float:
+    return get_intersection_marks(player).item(intersection.index)
+
+
+def get_intersection_marks(player: Player) -> np.ndarray:
+    # mark_intersection for all the intersections of the board: everything is linear in the expectations
+    if player.intersection_marks is None:
+        expectations = player.board.intersection_expectations
+        ports = player.board.intersection_ports
+        # The productions (mark_resource_expectation)
+        marks = expectations @ np.array([mark_resource_expectation(player, res, 1.) for res in ORDER_RESOURCES])
+        # The ports we do not have yet
+        for i, resource in enumerate(ORDER_PORTS):
+            if resource in player.ports:
+                continue
+            if resource == Resource.P_3_FOR_1:
+                marks += ports[:, i] * mark_port(player, resource)
             else:
-                special_expectation = player.production_expectation[path.port.resource]
-                for tile in intersection.neighbour_tiles:
-                    if tile.resource == path.port.resource:
-                        special_expectation += get_probability_to_roll(tile.dice_number)
-                mark += mark_port(player, path.port.resource, special_expectation=special_expectation)
-    return 6 * mark
+                special_expectations = player.production_expectation[resource] + expectations[:, i]
+                marks += ports[:, i] * mark_port(player, resource, special_expectation=special_expectations)
+        marks = 6 * marks
+        marks.flags.writeable = False
+        player.intersection_marks = marks
+    return player.intersection_marks
 
 
 def mark_tile_thief(player: Player, tile: Tile):
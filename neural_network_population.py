@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import numpy as np
+from typing import TYPE_CHECKING
+
+from strategy_neural_network import StrategyNeuralNetwork, squeeze_function, squeeze_function_derivative
+
+if TYPE_CHECKING:
+    from board import Board
+    from player import Player
+
+
+class NeuralNetworkPopulation:
+    """
+    Networks with the same layers, their weights stacked: weights[n][p] is the n-th weight matrix of the p-th network
+    The whole population is evaluated, trained and inherited at once with batched matrix products
+    """
+
+    def __init__(self, weights: list[np.array], biases: list[np.array]):
+        self.weights = weights  # (num_networks, n2, n1) each
+        self.biases = biases  # (num_networks, n2, 1) each
+
+    @staticmethod
+    def from_networks(networks: list[StrategyNeuralNetwork]) -> NeuralNetworkPopulation:
+        return NeuralNetworkPopulation([np.stack([network.weights[n] for network in networks])
+                                        for n in range(len(networks[0].weights))],
+                                       [np.stack([network.biases[n] for network in networks])
+                                        for n in range(len(networks[0].biases))])
+
+    def to_networks(self, board: Board, player: Player) -> list[StrategyNeuralNetwork]:
+        return [StrategyNeuralNetwork(board, player, [weight[p].copy() for weight in self.weights],
+                                      [bias[p].copy() for bias in self.biases])
+                for p in range(self.num_networks)]
+
+    @property
+    def num_networks(self) -> int:
+        return self.weights[0].shape[0]
+
+    def astype(self, dtype: np.dtype | type):
+        self.weights = [weight.astype(dtype) for weight in self.weights]
+        self.biases = [bias.astype(dtype) for bias in self.biases]
+
+    def feedforward(self, layers: np.array) -> np.array:
+        # layers: (n0, num_states) the same states for all the networks, or (num_networks, n0, num_states)
+        # Returns the marks (num_networks, num_states)
+        for weight, bias in zip(self.weights, self.biases):
+            layers = squeeze_function(np.matmul(weight, layers) + bias)
+        return layers[:, 0, :]
+
+    def accuracy(self, training_data: list[tuple[np.array, float]]) -> np.array:
+        marks = self.feedforward(np.hstack([layer for layer, _ in training_data]))
+        answers = np.array([answer for _, answer in training_data])
+        return np.sum((marks - answers) ** 2, axis=1) ** 0.5 / len(training_data)
+
+    def _backpropagation(self, layers: np.array, answers: np.array):
+        # layers: (num_networks, n0, batch_size), answers: (num_networks, batch_size)
+        # Returns the sums of the deltas over the batch of each network
+        neurons = []
+        neurons_squeezed = [layers]
+        for weight, bias in zip(self.weights, self.biases):
+            layers = np.matmul(weight, layers) + bias
+            neurons.append(layers)
+            layers = squeeze_function(layers)
+            neurons_squeezed.append(layers)
+
+        delta_neurons = squeeze_function_derivative(neurons[-1]) * (answers[:, np.newaxis, :] - neurons_squeezed[-1])
+        delta_weights = [np.matmul(delta_neurons, neurons_squeezed[-2].swapaxes(1, 2))]
+        delta_biases = [delta_neurons.sum(axis=2, keepdims=True)]
+
+        for idx in range(2, len(self.weights) + 1):
+            delta_neurons = squeeze_function_derivative(neurons[-idx]) * \
+                            np.matmul(self.weights[-idx + 1].swapaxes(1, 2), delta_neurons)
+            delta_biases.insert(0, delta_neurons.sum(axis=2, keepdims=True))
+            delta_weights.insert(0, np.matmul(delta_neurons, neurons_squeezed[-idx - 1].swapaxes(1, 2)))
+
+        return delta_weights, delta_biases
+
+    def _training_step(self, layers: np.array, answers: np.array, coef_step: float):
+        delta_weights, delta_biases = self._backpropagation(layers, answers)
+        coef = coef_step / answers.shape[1]
+        self.weights = [weight + coef * delta_weight for weight, delta_weight in zip(self.weights, delta_weights)]
+        self.biases = [bias + coef * delta_bias for bias, delta_bias in zip(self.biases, delta_biases)]
+
+    def train(self, training_data: list[tuple[np.array, float]], list_num_data: list, list_num_steps: list,
+              list_coef_step: list, rng: np.random.Generator, dtype: np.dtype | type | None = None):
+        # Same schedule as StrategyNeuralNetwork.train_network, each network with its own order of the data
+        if dtype is not None:
+            self.astype(dtype)
+        dtype = self.weights[0].dtype
+        layers = np.hstack([layer for layer, _ in training_data]).astype(dtype, copy=False)
+        answers = np.array([answer for _, answer in training_data], dtype=dtype)
+
+        num_tot_data = len(training_data)
+        orders = rng.permuted(np.tile(np.arange(num_tot_data), (self.num_networks, 1)), axis=1)
+        idx = 0
+        for num_steps, num_data, coef_step in zip(list_num_steps, list_num_data, list_coef_step):
+            for _ in range(num_steps):
+                if idx + num_data > num_tot_data:
+                    step_orders = orders[:, idx:num_tot_data]
+                    orders = rng.permuted(orders, axis=1)
+                    idx = idx + num_data - num_tot_data
+                    step_orders = np.concatenate([step_orders, orders[:, 0:idx]], axis=1)
+                else:
+                    step_orders = orders[:, idx:idx + num_data]
+                    idx += num_data
+                # (n0, num_networks, batch_size) -> (num_networks, n0, batch_size)
+                self._training_step(layers[:, step_orders].transpose(1, 0, 2), answers[step_orders], coef_step)
+
+    def inherit(self, parents: list[list[int]], probas_mutation: list[float], mutation_scales: list[float],
+                rng: np.random.Generator) -> NeuralNetworkPopulation:
+        # One child per list of parents (indexes in this population): the mean of its parents, each value being
+        # mutated (uniformly in [-mutation_scale, mutation_scale]) with the probability proba_mutation of the child
+        mixing = np.zeros((len(parents), self.num_networks))
+        for child, child_parents in enumerate(parents):
+            for parent in child_parents:
+                mixing[child, parent] += 1 / len(child_parents)
+        probas_mutation = np.array(probas_mutation)
+        mutation_scales = np.array(mutation_scales)
+
+        def inherit_arrays(arrays: np.array) -> np.array:
+            children = np.einsum("cp,p...->c...", mixing.astype(arrays.dtype), arrays)
+            shape = (-1,) + (1,) * (children.ndim - 1)
+            mutated = rng.random(children.shape) < probas_mutation.reshape(shape)
+            mutations = rng.uniform(-1., 1., children.shape) * mutation_scales.reshape(shape)
+            return children + np.where(mutated, mutations, 0.).astype(children.dtype)
+
+        return NeuralNetworkPopulation([inherit_arrays(weight) for weight in self.weights],
+                                       [inherit_arrays(bias) for bias in self.biases])
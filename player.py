@@ -4,25 +4,32 @@ from typing import Generator, TYPE_CHECKING
 from abc import abstractmethod
 
 import pygame
+import numpy as np
 
 from constants import NUM_CARD_MAX_THIEF, SIZE_MIN_LARGEST_ARMY, LENGTH_MIN_LONGEST_ROAD
-from resource import Resource
-from resource_hand_count import ResourceHandCount, get_all_possible_set_of_resources
+from resource import Resource, ORDER_RESOURCES
+from resource_hand_count import ResourceHandCount, get_deficits
 from dev_cards import DevCard, ORDER_DEV_CARD
 from color import Color
-from construction import Construction, ConstructionKind
+from construction import Construction, ConstructionKind, NUM_CONSTRUCTION_MAX
 from probability import get_probability_to_roll
 from rendering_functions import render_text
 from tile import Tile
 from tile_intersection import TileIntersection
 from tile_path import TilePath
-from exchange import Exchange
+from exchange import Exchange, get_bank_exchanges
+from longest_road import LongestRoad
+from road_distances import RoadDistances
 from actions import Action, ActionBuildColony, ActionBuildRoad, ActionBuildTown, ActionBuyDevCard, ActionRevealDevCard
 
 if TYPE_CHECKING:
     from board import Board
 
 
+def _get_index(tile_element: TileIntersection | TilePath) -> int:
+    return tile_element.index
+
+
 class Player:
     color: Color
     resource_cards: ResourceHandCount
@@ -36,6 +43,7 @@ class Player:
         self.num_dev_cards_just_bought: int = 0
         self.dev_cards_revealed: list[DevCard] = []
         self.board = board
+        self.index = self.board.add_player(self)
         self.board.players_longest_road.append(self)
 
         self.num_cards_to_remove_for_thief = 0
@@ -45,6 +53,23 @@ class Player:
         self.exchange_accepted = False
         self.monopoly_resource: None | Resource = None
         self.length_longest_road: int = 0
+        self.longest_road = LongestRoad(self)
+        self.road_distances = RoadDistances(self)
+
+        # Kept up to date by the board
+        self.roads: set[TilePath] = set()
+        self.colonies: set[TileIntersection] = set()
+        self.towns: set[TileIntersection] = set()
+        self.ports: set[Resource] = set()
+        self.num_ports: dict[Resource, int] = {}
+        # Number of cards given to the bank for one card, depending on the ports
+        self.exchange_rates: dict[Resource, int] = {res: 4 for res in ORDER_RESOURCES}
+        # Mark of each intersection for the player, computed by the marking functions when it is None
+        # (reset when the production expectation or the ports change)
+        self.intersection_marks: np.ndarray | None = None
+        # Where we could build if we had the cards and the remaining constructions
+        self.road_frontier: set[TilePath] = set()
+        self.colony_frontier: set[TileIntersection] = set()
 
         self.production_expectation: dict[Resource, float] = {
             Resource.CLAY: 0,
@@ -56,19 +81,16 @@ class Player:
 
     def add_road(self, path: TilePath):
         path.road_player = self
+        self.longest_road.add_road(path)
         self.update_longest_road()
 
     def add_colony(self, intersection: TileIntersection):
         intersection.content = Construction(ConstructionKind.COLONY, self)
         # Check if we cut the longest road
-        player = None
-        for path in intersection.neighbour_paths:
-            if path.road_player is None or path.road_player == self:
-                continue
-            if player is None:
-                player = path.road_player
-                continue
-            if player == path.road_player:
+        road_players = [path.road_player for path in intersection.neighbour_paths]
+        for player in self.board.players:
+            if not player == self and road_players.count(player) >= 2:
+                player.longest_road.cut(intersection)
                 player.update_longest_road()
         self.update_production_expectations(intersection)
 
@@ -76,7 +98,79 @@ class Player:
         intersection.content = Construction(ConstructionKind.TOWN, self)
         self.update_production_expectations(intersection)
 
+    def register_road(self, path: TilePath):
+        self.roads.add(path)
+
+    def unregister_road(self, path: TilePath):
+        self.roads.remove(path)
+
+    def register_construction(self, intersection: TileIntersection, kind: ConstructionKind):
+        if kind == ConstructionKind.COLONY:
+            self.colonies.add(intersection)
+        else:
+            self.towns.add(intersection)
+        for path in intersection.neighbour_paths:
+            if path.port is not None:
+                self.num_ports[path.port.resource] = self.num_ports.get(path.port.resource, 0) + 1
+                if path.port.resource not in self.ports:
+                    self.ports.add(path.port.resource)
+                    self._update_exchange_rates()
+
+    def unregister_construction(self, intersection: TileIntersection, kind: ConstructionKind):
+        if kind == ConstructionKind.COLONY:
+            self.colonies.remove(intersection)
+        else:
+            self.towns.remove(intersection)
+        for path in intersection.neighbour_paths:
+            if path.port is not None:
+                self.num_ports[path.port.resource] -= 1
+                if self.num_ports[path.port.resource] == 0:
+                    self.ports.remove(path.port.resource)
+                    self._update_exchange_rates()
+
+    def _update_exchange_rates(self):
+        self.intersection_marks = None
+        rate = 3 if Resource.P_3_FOR_1 in self.ports else 4
+        for res in ORDER_RESOURCES:
+            self.exchange_rates[res] = 2 if res in self.ports else rate
+
+    def can_reach_path(self, path: TilePath) -> bool:
+        if path.road_player is not None:
+            return False
+        # check if there is one of our colony/town around it
+        for inter in path.intersections:
+            if inter in self.colonies or inter in self.towns:
+                return True
+        # check if there is one of our road around it
+        for inter in path.intersections:
+            for p in inter.neighbour_paths:
+                if p in self.roads:
+                    return True
+        return False
+
+    def can_reach_intersection(self, intersection: TileIntersection) -> bool:
+        if not intersection.can_build():
+            return False
+        # check if there is one of our road around it
+        for p in intersection.neighbour_paths:
+            if p in self.roads:
+                return True
+        return False
+
+    def update_frontiers(self, paths: list[TilePath], intersections: list[TileIntersection]):
+        for path in paths:
+            if self.can_reach_path(path):
+                self.road_frontier.add(path)
+            else:
+                self.road_frontier.discard(path)
+        for inter in intersections:
+            if self.can_reach_intersection(inter):
+                self.colony_frontier.add(inter)
+            else:
+                self.colony_frontier.discard(inter)
+
     def update_production_expectations(self, new_intersection: TileIntersection):
+        self.intersection_marks = None
         for tile in new_intersection.neighbour_tiles:
             if tile.resource == Resource.DESERT:
                 continue
@@ -135,7 +229,7 @@ class Player:
         self.board.thief_tile = tile
 
     def steal_card(self, player: Player | None):
-        res = player.resource_cards.random_resource()
+        res = player.resource_cards.random_resource(self.board.rng)
         self.add_one_resource(res)
         player.try_consume_one(res)
 
@@ -186,25 +280,19 @@ class Player:
 
     # ------------------------------------------------------------------------------------------------
 
-    def find_all_intersection_belonging_to_player(self) -> Generator[TileIntersection, None, None]:
-        for inte in self.board.intersections:
-            if inte.content is not None and inte.content.player == self:
-                yield inte
+    # Sorted as on the board, so that the strategies stay deterministic
+
+    def find_all_intersection_belonging_to_player(self) -> list[TileIntersection]:
+        return sorted(self.colonies | self.towns, key=_get_index)
 
-    def find_all_colonies_belonging_to_player(self) -> Generator[TileIntersection, None, None]:
-        for inte in self.board.intersections:
-            if inte.content == Construction(ConstructionKind.COLONY, self):
-                yield inte
+    def find_all_colonies_belonging_to_player(self) -> list[TileIntersection]:
+        return sorted(self.colonies, key=_get_index)
 
-    def find_all_towns_belonging_to_player(self) -> Generator[TileIntersection, None, None]:
-        for inte in self.board.intersections:
-            if inte.content == Construction(ConstructionKind.TOWN, self):
-                yield inte
+    def find_all_towns_belonging_to_player(self) -> list[TileIntersection]:
+        return sorted(self.towns, key=_get_index)
 
-    def find_all_path_belonging_to_player(self) -> Generator[TilePath, None, None]:
-        for path in self.board.paths:
-            if path.road_player == self:
-                yield path
+    def find_all_path_belonging_to_player(self) -> list[TilePath]:
+        return sorted(self.roads, key=_get_index)
 
     def get_resource_production_expectation_with_thief(self) -> dict[Resource, float]:
         if self.board.thief_tile.resource == Resource.DESERT:
@@ -230,40 +318,20 @@ class Player:
 
         return prod_turns
 
-    def get_ports(self) -> Generator[Resource]:
-        for path in self.board.paths:
-            if path.port is not None and (
-                    path.intersections[0].content is not None and path.intersections[0].content.player == self or
-                    path.intersections[1].content is not None and path.intersections[1].content.player == self):
-                yield path.port.resource
+    def get_number_of_turns_to_afford(self, hands: np.ndarray, cost: ResourceHandCount,
+                                      with_thief: bool = False) -> np.ndarray:
+        # For each hand (one per row), the number of turns to produce the missing cards
+        prod_turns = self.get_resource_production_in_number_of_turns_with_systematic_exchange(with_thief=with_thief)
+        return (get_deficits(hands, cost) * [prod_turns[res] for res in ORDER_RESOURCES]).max(axis=1)
+
+    def get_ports(self) -> frozenset[Resource]:
+        return frozenset(self.ports)
 
     def get_all_possible_exchanges_with_the_bank(self) -> Generator[Exchange]:
-        ports = list(self.get_ports())
-        n_min = 3 if Resource.P_3_FOR_1 in ports else 4
-        hand_abstract_exchange = ResourceHandCount()
-        hand_abstract_multiplication = ResourceHandCount()
-        for res, num in self.resource_cards.items():
-            if res in ports:
-                n = 2
-            else:
-                n = n_min
-            hand_abstract_exchange[res] = num // n
-            hand_abstract_multiplication[res] = n
-
-        for i in range(1, 1 + hand_abstract_exchange.num_resources()):
-            for gain in get_all_possible_set_of_resources(i):
-                for lost in hand_abstract_exchange.subsets_of_size_k(i):
-                    intelligent = True
-                    for res, num in lost.items():
-                        if num == 0:
-                            continue
-                        else:
-                            if not gain[res] == 0:
-                                intelligent = False
-                                break
-                            lost[res] *= hand_abstract_multiplication[res]
-                    if intelligent:
-                        yield Exchange(gain, lost)
+        rates = tuple(self.exchange_rates[res] for res in ORDER_RESOURCES)
+        max_lost = tuple(num // rate for num, rate in zip(self.resource_cards.counts, rates))
+        for gain, lost in get_bank_exchanges(max_lost, rates):
+            yield Exchange(ResourceHandCount.from_counts(list(gain)), ResourceHandCount.from_counts(list(lost)))
 
     def num_bonus_victory_points(self) -> int:
         num = 0
@@ -274,14 +342,9 @@ class Player:
         return num
 
     def num_victory_points(self, without_longest_road_and_largest_army: bool = False) -> int:
-        num = 0
+        num = len(self.colonies) + 2 * len(self.towns)
         if not without_longest_road_and_largest_army:
             num += self.num_bonus_victory_points()
-        for inter in self.board.intersections:
-            if inter.content is not None and inter.content.player == self:
-                num += 1
-                if inter.content.kind == ConstructionKind.TOWN:
-                    num += 1
         for dev_card in self.dev_cards_revealed:
             if dev_card == DevCard.VICTORY_POINT:
                 num += 1
@@ -295,25 +358,13 @@ class Player:
         return n
 
     def num_roads_belonging_to_player(self):
-        n = 0
-        for path in self.board.paths:
-            if path.road_player == self:
-                n += 1
-        return n
+        return len(self.roads)
 
     def num_colonies_belonging_to_player(self):
-        n = 0
-        for inte in self.board.intersections:
-            if inte.content == Construction(ConstructionKind.COLONY, self):
-                n += 1
-        return n
+        return len(self.colonies)
 
     def num_towns_belonging_to_player(self):
-        n = 0
-        for inte in self.board.intersections:
-            if inte.content == Construction(ConstructionKind.TOWN, self):
-                n += 1
-        return n
+        return len(self.towns)
 
     def num_constructions_belonging_to_player(self, kind: ConstructionKind):
         if kind == ConstructionKind.ROAD:
@@ -324,32 +375,29 @@ class Player:
             return self.num_towns_belonging_to_player()
 
     def get_initial_colony_intersection_without_road(self) -> TileIntersection:
-        for inter in self.board.intersections:
-            if inter.content == Construction(ConstructionKind.COLONY, self):
-                has_roads = False
-                for path in inter.neighbour_paths:
-                    if path.road_player is not None:
-                        has_roads = True
-                        break
-                if not has_roads:
-                    return inter
+        for inter in self.find_all_colonies_belonging_to_player():
+            has_roads = False
+            for path in inter.neighbour_paths:
+                if path.road_player is not None:
+                    has_roads = True
+                    break
+            if not has_roads:
+                return inter
         assert False
 
     def can_exchange_with_the_bank(self, exchange: Exchange) -> bool:
-        # We look for the ports
-        ports = list(self.get_ports())
         # 2 for 1
         if 2 * sum(exchange.gain.values()) == sum(exchange.lost.values()):
             possible = True
             for res, num in exchange.lost:
-                if not (num % 2 == 0 and (num == 0 or res in ports)):
+                if not (num % 2 == 0 and (num == 0 or self.exchange_rates[res] == 2)):
                     possible = False
                     break
             if possible:
                 return True
 
         # 3 for 1
-        if Resource.P_3_FOR_1 in ports and 3 * sum(exchange.gain.values()) == sum(exchange.lost.values()):
+        if Resource.P_3_FOR_1 in self.ports and 3 * sum(exchange.gain.values()) == sum(exchange.lost.values()):
             possible = True
             for _, num in exchange.lost:
                 if not num % 3 == 0:
@@ -369,29 +417,7 @@ class Player:
         return False
 
     def get_length_longest_road(self):
-        def get_all_possible_length_from_intersection(intersection: TileIntersection, remaining_paths: set[TilePath]):
-            if len(remaining_paths) == 0:
-                return 0
-            better_length = 0
-            for path in intersection.neighbour_paths:
-                if path in remaining_paths:
-                    next_intersection = path.intersections[1 if path.intersections[0] == intersection else 0]
-                    length = 1
-                    if next_intersection.content is None or next_intersection.content.player == self:
-                        remaining_paths.remove(path)
-                        length += get_all_possible_length_from_intersection(next_intersection, remaining_paths)
-                        remaining_paths.add(path)
-                    better_length = max(length, better_length)
-            return better_length
-
-        paths_set = set(self.find_all_path_belonging_to_player())
-        if len(paths_set) == 0:
-            return 0
-        intersection_set = set()
-        for path_i in paths_set:
-            for inter in path_i.intersections:
-                intersection_set.add(inter)
-        return max(get_all_possible_length_from_intersection(inter, paths_set) for inter in intersection_set)
+        return self.longest_road.get_length()
 
     def update_longest_road(self):
         length = self.get_length_longest_road()
@@ -400,23 +426,19 @@ class Player:
             self.board.update_longest_road(self)
 
     def get_all_possible_one_shot_actions(self, include_dev_card: bool = True) -> Generator[Action]:
-        if self.has_resources(ActionBuildColony.cost):
-            for inter in self.board.intersections:
-                action = ActionBuildColony(inter, self)
-                if action.available():
-                    yield action
-
-        if self.has_resources(ActionBuildTown.cost):
-            for inter in self.board.intersections:
-                action = ActionBuildTown(inter, self)
-                if action.available():
-                    yield action
-
-        if self.has_resources(ActionBuildRoad.cost):
-            for path in self.board.paths:
-                action = ActionBuildRoad(path, self)
-                if action.available():
-                    yield action
+        # Only the legal actions, from the frontiers (sorted: they can change while the caller fakes the actions)
+        if self.has_resources(ActionBuildColony.cost) and \
+                len(self.colonies) < NUM_CONSTRUCTION_MAX[ConstructionKind.COLONY]:
+            for inter in sorted(self.colony_frontier, key=_get_index):
+                yield ActionBuildColony(inter, self)
+
+        if self.has_resources(ActionBuildTown.cost) and len(self.towns) < NUM_CONSTRUCTION_MAX[ConstructionKind.TOWN]:
+            for inter in self.find_all_colonies_belonging_to_player():
+                yield ActionBuildTown(inter, self)
+
+        if self.has_resources(ActionBuildRoad.cost) and len(self.roads) < NUM_CONSTRUCTION_MAX[ConstructionKind.ROAD]:
+            for path in sorted(self.road_frontier, key=_get_index):
+                yield ActionBuildRoad(path, self)
 
         if include_dev_card:
             if self.has_resources(ActionBuyDevCard.cost):
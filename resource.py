@@ -15,6 +15,7 @@ class Resource(Enum):
 
 
 ORDER_RESOURCES = [Resource.WOOD, Resource.CLAY, Resource.WOOL, Resource.HAY, Resource.ROCK]
+ORDER_PORTS = ORDER_RESOURCES + [Resource.P_3_FOR_1]
 
 
 @dataclass
@@ -1,87 +1,134 @@
 from __future__ import annotations
 
 from typing import Generator
-from random import randint
+from functools import lru_cache
+from itertools import product
+import random
+import numpy as np
 from resource import Resource, ORDER_RESOURCES
 
 
-class ResourceHandCount(dict):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        if Resource.CLAY not in self:
-            self[Resource.CLAY] = 0
-        if Resource.WOOD not in self:
-            self[Resource.WOOD] = 0
-        if Resource.WOOL not in self:
-            self[Resource.WOOL] = 0
-        if Resource.HAY not in self:
-            self[Resource.HAY] = 0
-        if Resource.ROCK not in self:
-            self[Resource.ROCK] = 0
+_RESOURCE_INDEXES = {res: i for i, res in enumerate(ORDER_RESOURCES)}
+_PACK_BITS = 8  # At most 255 cards of each resource (there are 19 in the game)
+
+
+class ResourceHandCount:
+    """
+    The number of cards of each resource, stored in the order of ORDER_RESOURCES
+    """
+    __slots__ = ("counts",)
+
+    def __init__(self, resources: dict[Resource, int] | ResourceHandCount | None = None):
+        self.counts = [0] * len(ORDER_RESOURCES)
+        if resources is not None:
+            for res, num in resources.items():
+                self.counts[_RESOURCE_INDEXES[res]] = num
+
+    @staticmethod
+    def from_counts(counts: list[int]) -> ResourceHandCount:
+        hand = ResourceHandCount.__new__(ResourceHandCount)
+        hand.counts = counts
+        return hand
+
+    @staticmethod
+    def unpack(key: int) -> ResourceHandCount:
+        mask = (1 << _PACK_BITS) - 1
+        return ResourceHandCount.from_counts([(key >> (_PACK_BITS * i)) & mask for i in range(len(ORDER_RESOURCES))])
+
+    def pack(self) -> int:
+        # Hashable and cheap to compare, to be used as a dict key
+        key = 0
+        for i, num in enumerate(self.counts):
+            key |= num << (_PACK_BITS * i)
+        return key
+
+    def __getitem__(self, res: Resource) -> int:
+        return self.counts[_RESOURCE_INDEXES[res]]
+
+    def __setitem__(self, res: Resource, num: int):
+        self.counts[_RESOURCE_INDEXES[res]] = num
+
+    def __contains__(self, res: Resource) -> bool:
+        return res in _RESOURCE_INDEXES
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ResourceHandCount):
+            return NotImplemented
+        return self.counts == other.counts
+
+    def __repr__(self) -> str:
+        return f"ResourceHandCount({{{', '.join(f'{res.name}: {num}' for res, num in self.items())}}})"
+
+    def keys(self) -> tuple[Resource, ...]:
+        return tuple(ORDER_RESOURCES)
+
+    def values(self) -> tuple[int, ...]:
+        return tuple(self.counts)
+
+    def items(self) -> zip[tuple[Resource, int]]:
+        return zip(ORDER_RESOURCES, self.counts)
 
     def add_one(self, res: Resource, num: int = 1):
-        self[res] += num
+        self.counts[_RESOURCE_INDEXES[res]] += num
 
     def try_consume_one(self, res: Resource):
-        if self[res] >= 1:
-            self[res] -= 1
+        i = _RESOURCE_INDEXES[res]
+        if self.counts[i] >= 1:
+            self.counts[i] -= 1
             return True
         return False
 
     def has(self, cost: ResourceHandCount):
-        for res, count in cost.items():
-            if self[res] < count:
+        for num, count in zip(self.counts, cost.counts):
+            if num < count:
                 return False
         return True
 
     def consume(self, cost: ResourceHandCount):
-        for res, count in cost.items():
-            self[res] -= count
-            assert self[res] >= 0
+        self.counts = [num - count for num, count in zip(self.counts, cost.counts)]
+        assert min(self.counts) >= 0
 
     def add(self, cost: ResourceHandCount):
-        for res, count in cost.items():
-            self[res] += count
+        self.counts = [num + count for num, count in zip(self.counts, cost.counts)]
 
     def num_resources(self):
-        return sum(self.values())
+        return sum(self.counts)
 
     def subtract_fine_if_not_present(self, cost: ResourceHandCount):
-        for res in cost.keys():
-            self[res] = max(0, self[res] - cost[res])
+        self.counts = [max(0, num - count) for num, count in zip(self.counts, cost.counts)]
 
     def copy(self) -> ResourceHandCount:
-        return ResourceHandCount(self)
+        return ResourceHandCount.from_counts(self.counts.copy())
 
     def subsets(self) -> Generator[ResourceHandCount]:
-        for res, num in self:
-            if num > 0:
-                self[res] = 0
-                for sub_set in self.subsets():
-                    yield sub_set.copy()
-                    for _ in range(num):
-                        sub_set.add_one(res)
-                        yield sub_set.copy()
-                return
-        yield ResourceHandCount()
+        for counts in product(*(range(num + 1) for num in self.counts)):
+            yield ResourceHandCount.from_counts(list(counts))
 
     def subsets_of_size_k(self, k: int) -> Generator[ResourceHandCount]:
-        for subset in self.subsets():
-            if sum(subset.values()) == k:
-                yield subset
-
-    def random_resource(self):
-        assert sum(self.values()) > 0
-        n = randint(0, sum(self.values()) - 1)
-        for res in ORDER_RESOURCES:
-            n -= self[res]
+        for counts in get_bounded_compositions(tuple(self.counts), k):
+            yield ResourceHandCount.from_counts(list(counts))
+
+    def subsets_of_size_k_matrix(self, k: int) -> np.ndarray:
+        # One sub-hand per row, in the same order as subsets_of_size_k
+        return get_bounded_compositions_matrix(tuple(self.counts), k)
+
+    def random_resource(self, rng: random.Random | None = None):
+        assert sum(self.counts) > 0
+        if rng is None:
+            rng = random
+        n = rng.randint(0, sum(self.counts) - 1)
+        for res, num in zip(ORDER_RESOURCES, self.counts):
+            n -= num
             if n < 0:
                 return res
         assert False
 
     def list_resources(self) -> Generator[Resource]:
-        for res in ORDER_RESOURCES:
-            for _ in range(self[res]):
+        for res, num in zip(ORDER_RESOURCES, self.counts):
+            for _ in range(num):
                 yield res
 
     def __iter__(self):
@@ -100,10 +147,39 @@ def get_all_possible_set_of_resources(n) -> Generator[ResourceHandCount]:
                 for d in range(n - a - b - c):
                     e = n - a - b - c - d - 1
                     # assert e >= 0
-                    yield ResourceHandCount({
-                        Resource.CLAY: a,
-                        Resource.WOOD: b,
-                        Resource.WOOL: c,
-                        Resource.HAY: d,
-                        Resource.ROCK: e,
-                    })
+                    # In the order of ORDER_RESOURCES: WOOD, CLAY, WOOL, HAY, ROCK
+                    yield ResourceHandCount.from_counts([b, a, c, d, e])
+
+
+@lru_cache(maxsize=4096)
+def get_bounded_compositions(bounds: tuple[int, ...], k: int) -> tuple[tuple[int, ...], ...]:
+    # All the ways to write k as a sum of len(bounds) numbers, the i-th one being between 0 and bounds[i]
+    max_remaining = [sum(bounds[i + 1:]) for i in range(len(bounds))]
+    compositions: list[tuple[tuple[int, ...], int]] = [((), k)]
+    for bound, max_after in zip(bounds, max_remaining):
+        compositions = [(composition + (num,), remaining - num)
+                        for composition, remaining in compositions
+                        for num in range(max(0, remaining - max_after), min(bound, remaining) + 1)]
+    return tuple(composition for composition, _ in compositions)
+
+
+@lru_cache(maxsize=4096)
+def get_bounded_compositions_matrix(bounds: tuple[int, ...], k: int) -> np.ndarray:
+    matrix = np.array(get_bounded_compositions(bounds, k), dtype=np.int16).reshape(-1, len(bounds))
+    matrix.flags.writeable = False
+    return matrix
+
+
+# Hands as matrices: one hand per row, the columns in the order of ORDER_RESOURCES
+
+def hands_to_matrix(hands: list[ResourceHandCount]) -> np.ndarray:
+    return np.array([hand.counts for hand in hands], dtype=np.int16).reshape(-1, len(ORDER_RESOURCES))
+
+
+def can_afford(hands: np.ndarray, cost: ResourceHandCount) -> np.ndarray:
+    return (hands >= cost.counts).all(axis=1)
+
+
+def get_deficits(hands: np.ndarray, cost: ResourceHandCount) -> np.ndarray:
+    # The cards missing in each hand to pay the cost
+    return np.maximum(np.array(cost.counts) - hands, 0)
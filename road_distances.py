@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING
+
+from construction import ConstructionKind, NUM_CONSTRUCTION_MAX
+
+if TYPE_CHECKING:
+    from player import Player
+    from tile_intersection import TileIntersection
+    from tile_path import TilePath
+
+
+def compute_road_distances(starts: list[TileIntersection], num_roads_max: int) \
+        -> tuple[dict[TileIntersection, int], dict[TileIntersection, tuple[TilePath, TileIntersection]]]:
+    # Number of roads to build to reach each free intersection (at most num_roads_max), and the last road to build
+    # with the intersection it comes from
+    distances: dict[TileIntersection, int] = {start: 0 for start in starts}
+    parents: dict[TileIntersection, tuple[TilePath, TileIntersection]] = {}
+    q = deque(distances)
+    while q:
+        inter = q.popleft()
+        d = distances[inter] + 1
+        # is there enough remaining roads to build
+        if d > num_roads_max:
+            break
+        for path in inter.neighbour_paths:
+            if path.road_player is not None:
+                continue
+            for neigh in path.intersections:
+                if neigh.content is None and neigh not in distances:
+                    distances[neigh] = d
+                    q.append(neigh)
+                    # All the intersections at the distance d - 1 are known: we take the first one around
+                    for parent_path, parent in neigh.neighbour_paths_intersection():
+                        if parent_path.road_player is None and distances.get(parent) == d - 1:
+                            parents[neigh] = (parent_path, parent)
+                            break
+    return distances, parents
+
+
+class RoadDistances:
+    """
+    The distances from the network of a player, computed again only when the board has changed
+    """
+
+    def __init__(self, player: Player):
+        self.player = player
+        self.board_version = -1
+        self.distances: dict[TileIntersection, int] = {}
+        self.parents: dict[TileIntersection, tuple[TilePath, TileIntersection]] = {}
+
+    def get_distances(self) -> dict[TileIntersection, int]:
+        self._update()
+        return self.distances
+
+    def get_roads_to(self, intersection: TileIntersection) -> list[TilePath]:
+        # In the order to build them
+        self._update()
+        return get_roads_to(intersection, self.parents)
+
+    def _update(self):
+        if self.board_version == self.player.board.version:
+            return
+        self.board_version = self.player.board.version
+        # A dict to keep the order of the starts without duplicates
+        starts = dict.fromkeys(self.player.find_all_intersection_belonging_to_player())
+        for path in self.player.find_all_path_belonging_to_player():
+            for inter in path.intersections:
+                if inter.content is None:
+                    starts.setdefault(inter)
+        num_roads_max = NUM_CONSTRUCTION_MAX[ConstructionKind.ROAD] - self.player.num_roads_belonging_to_player()
+        self.distances, self.parents = compute_road_distances(list(starts), num_roads_max)
+
+
+def get_roads_to(intersection: TileIntersection,
+                 parents: dict[TileIntersection, tuple[TilePath, TileIntersection]]) -> list[TilePath]:
+    roads = []
+    while intersection in parents:
+        path, intersection = parents[intersection]
+        roads.append(path)
+    roads.reverse()
+    return roads
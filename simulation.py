@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import random
+from multiprocessing import Pool
+from typing import Callable
+
+import numpy as np
+
+from board import Board
+from game import Game, GameResult
+from player import Player
+from strategy import Strategy
+from ia_player import IaPlayer
+
+# A strategy class (or any picklable callable with the same signature)
+StrategyFactory = Callable[[Board, Player], Strategy]
+
+NUM_TURNS_MAX = 500
+
+
+def _get_strategy_name(strategy: StrategyFactory) -> str:
+    # functools.partial and other callable instances have no __name__
+    return getattr(strategy, "__name__", type(strategy).__name__)
+
+
+def play_game(strategies: list[StrategyFactory], seed: int | None = None,
+              num_turns_max: int = NUM_TURNS_MAX) -> GameResult:
+    game = Game([f"{_get_strategy_name(strategy)} {i + 1}" for i, strategy in enumerate(strategies)], seed)
+    player_managers: dict[Player, IaPlayer] = {
+        player: IaPlayer(player, strategy(game.board, player)) for player, strategy in zip(game.players, strategies)
+    }
+    return game.run_to_end(player_managers, num_turns_max)
+
+
+def _play_game_task(args: tuple[list[StrategyFactory], int, int]) -> GameResult:
+    return play_game(*args)
+
+
+def simulate_games(strategies: list[StrategyFactory], num_games: int, num_processes: int | None = None,
+                   num_turns_max: int = NUM_TURNS_MAX, seed: int | None = None) -> list[GameResult]:
+    # Each game gets its own seed (kept in its result): any game can be replayed alone with play_game
+    rng = random.Random(seed)
+    tasks = [(strategies, rng.randrange(2 ** 32), num_turns_max) for _ in range(num_games)]
+    with Pool(num_processes) as pool:
+        return list(pool.imap(_play_game_task, tasks, chunksize=1))
+
+
+if __name__ == "__main__":
+    from strategy_with_objectives import StrategyWithObjectives
+
+    results = simulate_games([StrategyWithObjectives] * 4, 100)
+    wins = [0, 0, 0, 0]
+    for result in results:
+        if result.winner is not None:
+            wins[result.winner] += 1
+    print(f"Wins: {wins}")
+    print(f"Mean number of turns: {np.mean([result.num_turns for result in results])}")
+    print(f"Mean wall time: {np.mean([result.wall_time for result in results]):.3f}s")
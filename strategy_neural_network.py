@@ -4,33 +4,98 @@ import json
 import numpy as np
 from math import tanh
 from typing import TYPE_CHECKING
-from random import shuffle, random
 
 from strategy import Strategy
 from board import Board
 from resource import ORDER_RESOURCES
+from resource_hand_count import ResourceHandCount
 from dev_cards import ORDER_DEV_CARD
 from construction import Construction, ConstructionKind
+from board_state import NO_PLAYER
 from actions import Action, ActionBuildColony, ActionBuildRoad, ActionBuildTown
 from exchange import Exchange, BANK_PLAYER_FOR_EXCHANGE
 
 if TYPE_CHECKING:
     from player import Player
+    from tile_intersection import TileIntersection
+    from tile_path import TilePath
 
 
-def squeeze_function(x: float):
+def squeeze_function(x: float | np.ndarray):
+    # Applied elementwise to arrays
     return 1 / (1 + np.exp(-x))
 
 
-v_squeeze_function = np.vectorize(squeeze_function)
-
-
-def squeeze_function_derivative(x: float):
+def squeeze_function_derivative(x: float | np.ndarray):
     e = np.exp(-x)
     return e / ((1 + e) ** 2)
 
 
-v_squeeze_function_derivative = np.vectorize(squeeze_function_derivative)
+class FirstLayerAccumulator:
+    """
+    The inputs of the network and its first layer before the activation, for the current game state
+    When a few inputs change (a faked action...), only their columns of the first weight matrix are used
+    """
+
+    def __init__(self, strategy: StrategyNeuralNetwork, can_steal_card: bool = False):
+        self.strategy = strategy
+        self.board = strategy.board
+        self.player = strategy.player
+        self.weight = strategy.weights[0]
+        self.inputs = strategy._game_state_to_vector(can_steal_card=can_steal_card)[:, 0]
+        self.values = self.weight @ self.inputs + strategy.biases[0][:, 0]
+        self.saved: list[tuple[np.array, np.array]] = []
+
+        num_intersections = len(self.board.intersections)
+        num_paths = len(self.board.paths)
+        # Same order as _game_state_to_vector
+        self.start_paths = 2 * num_intersections
+        self.start_thief = self.start_paths + 2 * num_paths
+        self.start_hand = strategy.board_vector_size
+        self.index_can_steal_card = len(self.inputs) - 1
+        self.hand_indexes = np.arange(self.start_hand, self.start_hand + len(ORDER_RESOURCES))
+        self.thief_indexes = np.arange(self.start_thief, self.start_thief + len(self.board.tiles))
+
+    def push(self):
+        self.saved.append((self.inputs.copy(), self.values.copy()))
+
+    def pop(self):
+        self.inputs, self.values = self.saved.pop()
+
+    def _set_inputs(self, indexes: list[int] | np.array, inputs: list[float] | np.array):
+        delta = inputs - self.inputs[indexes]
+        self.values += self.weight[:, indexes] @ delta
+        self.inputs[indexes] = inputs
+
+    def update_intersection(self, intersection: TileIntersection):
+        content = intersection.content
+        value = 0. if content is None else content.kind.value / ConstructionKind.TOWN.value
+        is_player = content is not None and content.player == self.player
+        self._set_inputs([intersection.index, len(self.board.intersections) + intersection.index],
+                         [value if is_player else 0., 0. if is_player else value])
+
+    def update_path(self, path: TilePath):
+        road_player = path.road_player
+        self._set_inputs([self.start_paths + path.index, self.start_paths + len(self.board.paths) + path.index],
+                         [float(road_player == self.player), float(road_player is None)])
+
+    def update_thief(self):
+        thief = np.zeros(len(self.board.tiles))
+        thief[self.board.state.thief] = 1
+        self._set_inputs(self.thief_indexes, thief)
+
+    def update_hand(self):
+        self._set_inputs(self.hand_indexes, np.tanh(self.player.resource_cards.counts))
+
+    def update_can_steal_card(self, can_steal_card: bool):
+        self._set_inputs([self.index_can_steal_card], [1. if can_steal_card else 0.])
+
+    def update_action(self, action: Action):
+        self.update_hand()
+        if isinstance(action, ActionBuildRoad):
+            self.update_path(action.path)
+        elif isinstance(action, (ActionBuildColony, ActionBuildTown)):
+            self.update_intersection(action.intersection)
 
 
 class StrategyNeuralNetwork(Strategy):
@@ -40,73 +105,87 @@ class StrategyNeuralNetwork(Strategy):
     Without exchanges between players
     """
 
-    def __init__(self, board: Board, player: Player):
+    def __init__(self, board: Board, player: Player, weights: list[np.array] | None = None,
+                 biases: list[np.array] | None = None):
+        # Without weights and biases, they are drawn at random
         Strategy.__init__(self, board, player)
 
-        board_vector_size = len(self.board.tiles) + 2 * (len(self.board.intersections) + len(self.board.paths))
-        #                 = 271
+        self.board_vector_size = len(self.board.tiles) + 2 * (len(self.board.intersections) + len(self.board.paths))
+        #                      = 271
         player_vector_size = len(ORDER_DEV_CARD) + len(ORDER_RESOURCES)
         #                  = 16
-        input_size = board_vector_size + player_vector_size + 1  # 1 for can_steal_card
+        input_size = self.board_vector_size + player_vector_size + 1  # 1 for can_steal_card
         #          = 287
 
         self.layers: list[int] = [input_size, 30, 8, 1]
 
-        self.weights: np.array = [np.random.uniform(-1., 1., (n2, n1))
-                                  for n1, n2 in zip(self.layers[:-1], self.layers[1:])]
-        self.biases: np.array = [np.random.uniform(-1., 1., (n, 1)) for n in self.layers[1:]]
+        if weights is None:
+            weights = [self.board.np_rng.uniform(-1., 1., (n2, n1))
+                       for n1, n2 in zip(self.layers[:-1], self.layers[1:])]
+        if biases is None:
+            biases = [self.board.np_rng.uniform(-1., 1., (n, 1)) for n in self.layers[1:]]
+        self.weights: np.array = weights
+        self.biases: np.array = biases
 
     def play(self):
-        best_mark = self._mark_game_state()
         while True:
-            best_action_or_exchange: Action | Exchange | None = None
+            accumulator = FirstLayerAccumulator(self)
+            # The current state first: we only do something better
+            first_layers = [accumulator.values.copy()]
+            actions_and_exchanges: list[Action | Exchange] = []
             for action in self.player.get_all_possible_one_shot_actions(include_dev_card=False):
+                accumulator.push()
                 self._fake_action(action)
-                mark = self._mark_game_state()
+                accumulator.update_action(action)
+                first_layers.append(accumulator.values.copy())
                 self._unfake_action(action)
-                if mark > best_mark:
-                    best_action_or_exchange = action
-                    best_mark = mark
+                accumulator.pop()
+                actions_and_exchanges.append(action)
             for exchange in self.player.get_all_possible_exchanges_with_the_bank():
+                accumulator.push()
                 exchange.apply_one(self.player)
-                mark = self._mark_game_state()
+                accumulator.update_hand()
+                first_layers.append(accumulator.values.copy())
                 exchange.undo(self.player)
-                if mark > best_mark:
-                    best_action_or_exchange = exchange
-                    best_mark = mark
-            if best_action_or_exchange is None:
+                accumulator.pop()
+                actions_and_exchanges.append(exchange)
+            if not actions_and_exchanges:
                 return True
+            marks = self._mark_first_layers(first_layers)
+            best = int(np.argmax(marks[1:]))
+            if not marks[best + 1] > marks[0]:
+                return True
+            best_action_or_exchange = actions_and_exchanges[best]
             if isinstance(best_action_or_exchange, Action):
                 best_action_or_exchange.apply()
             elif isinstance(best_action_or_exchange, Exchange):
                 best_action_or_exchange.apply(self.player, BANK_PLAYER_FOR_EXCHANGE)
 
     def place_initial_colony(self):
-        best_mark = 0
-        best_inter = None
-        for inter in self.board.intersections:
-            if not inter.can_build():
-                continue
+        intersections = self.board.buildable_intersections()
+        accumulator = FirstLayerAccumulator(self)
+        first_layers = []
+        for inter in intersections:
+            accumulator.push()
             inter.content = Construction(ConstructionKind.COLONY, self.player)
-            mark = self._mark_game_state()
+            accumulator.update_intersection(inter)
+            first_layers.append(accumulator.values.copy())
             inter.content = None
-            if mark > best_mark:
-                best_inter = inter
-                best_mark = mark
-        return best_inter
+            accumulator.pop()
+        return intersections[int(np.argmax(self._mark_first_layers(first_layers)))]
 
     def place_road_around_initial_colony(self):
         inter = self.player.get_initial_colony_intersection_without_road()
-        best_mark = 0
-        best_path = None
+        accumulator = FirstLayerAccumulator(self)
+        first_layers = []
         for path in inter.neighbour_paths:
+            accumulator.push()
             path.road_player = self.player
-            mark = self._mark_game_state()
+            accumulator.update_path(path)
+            first_layers.append(accumulator.values.copy())
             path.road_player = None
-            if mark > best_mark:
-                best_path = path
-                best_mark = mark
-        return best_path
+            accumulator.pop()
+        return inter.neighbour_paths[int(np.argmax(self._mark_first_layers(first_layers)))]
 
     def _fake_action(self, action: Action):
         self.player.consume_resources(action.cost)
@@ -127,33 +206,29 @@ class StrategyNeuralNetwork(Strategy):
             action.intersection.content = Construction(ConstructionKind.COLONY, self.player)
 
     def remove_cards_thief(self, num_cards_kept: int):
-        best_resource_cards = None
-        best_mark = 0
-        old_hand = self.player.resource_cards
-        for resource_cards in self.player.resource_cards.copy().subsets_of_size_k(num_cards_kept):
-            self.player.resource_cards = resource_cards
-            mark = self._mark_game_state()
-            if mark > best_mark:
-                best_resource_cards = resource_cards
-                best_mark = mark
-        self.player.resource_cards = old_hand
-        assert best_resource_cards is not None
-        return best_resource_cards
+        # All the possible hands are marked at once: only the resources part of the game state changes
+        hands = self.player.resource_cards.subsets_of_size_k_matrix(num_cards_kept)
+        assert len(hands) > 0
+        accumulator = FirstLayerAccumulator(self)
+        first_layers = accumulator.values[:, np.newaxis] + accumulator.weight[:, accumulator.hand_indexes] @ \
+            (np.tanh(hands.T.astype(float)) - accumulator.inputs[accumulator.hand_indexes, np.newaxis])
+        marks = self._mark_first_layers(first_layers)
+        return ResourceHandCount.from_counts(hands[int(np.argmax(marks))].tolist())
 
     def move_thief(self):
-        best_mark = 0
-        best_tile = None
-        for tile in self.board.tiles:
-            if tile == self.board.thief_tile:
-                continue
-            old_tile = self.board.thief_tile
+        old_tile = self.board.thief_tile
+        tiles = [tile for tile in self.board.tiles if not tile == old_tile]
+        accumulator = FirstLayerAccumulator(self)
+        first_layers = []
+        for tile in tiles:
+            accumulator.push()
             self.board.thief_tile = tile
-            mark = self._mark_game_state(can_steal_card=self.player.can_steal())
-            if mark > best_mark:
-                best_tile = tile
-                best_mark = mark
-            self.board.thief_tile = old_tile
-        return best_tile
+            accumulator.update_thief()
+            accumulator.update_can_steal_card(self.player.can_steal())
+            first_layers.append(accumulator.values.copy())
+            accumulator.pop()
+        self.board.thief_tile = old_tile
+        return tiles[int(np.argmax(self._mark_first_layers(first_layers)))]
 
     def steal_card(self):
         # TODO : When we would take care of the other players of the game state vectorisation...
@@ -172,6 +247,15 @@ class StrategyNeuralNetwork(Strategy):
     def _mark_game_state(self, can_steal_card: bool = False):
         return float(self._feedforward(self._game_state_to_vector(can_steal_card=can_steal_card)))
 
+    def _mark_first_layers(self, first_layers: list[np.array] | np.array) -> np.array:
+        # The end of the forward pass, for all the first layers (before the activation) at once
+        if isinstance(first_layers, list):
+            first_layers = np.stack(first_layers, axis=1)
+        layer = squeeze_function(first_layers)
+        for i, weight in enumerate(self.weights[1:], start=1):
+            layer = squeeze_function(np.dot(weight, layer) + self.biases[i])
+        return layer[0]
+
     def _game_state_to_vector(self, can_steal_card: bool = False):
         # TODO : Infos on the other players...
         return np.concatenate([self._board_to_vector(), self._player_to_vector(),
@@ -184,24 +268,20 @@ class StrategyNeuralNetwork(Strategy):
         return np.concatenate([self._intersections_to_vector(), self._paths_to_vector(), self._thief_to_vector()])
 
     def _intersections_to_vector(self):
-        v_player = np.zeros((len(self.board.intersections), 1))
-        v_others = np.zeros((len(self.board.intersections), 1))
-        for i, inter in enumerate(self.board.intersections):
-            if inter.content is None:
-                continue
-            if inter.content.player == self.player:
-                v_player[i] = 1 if inter.content.kind == ConstructionKind.TOWN else 0.5
-            else:
-                v_others[i] = 1 if inter.content.kind == ConstructionKind.TOWN else 0.5
-        return np.concatenate([v_player, v_others])
+        state = self.board.state
+        # 0.5 for a colony, 1 for a town
+        values = state.intersection_kind / ConstructionKind.TOWN.value
+        is_player = state.intersection_owner == self.player.index
+        return np.concatenate([np.where(is_player, values, 0.), np.where(is_player, 0., values)]).reshape(-1, 1)
 
     def _paths_to_vector(self):
-        return np.concatenate([np.array([[1 if path.road_player == self.player else 0] for path in self.board.paths]),
-                               np.array([[1 if path.road_player is None else 0] for path in self.board.paths])])
+        state = self.board.state
+        return np.concatenate([state.path_owner == self.player.index,
+                               state.path_owner == NO_PLAYER]).astype(float).reshape(-1, 1)
 
     def _thief_to_vector(self):
         v = np.zeros((len(self.board.tiles), 1))
-        v[self.board.tiles.index(self.board.thief_tile)] = 1
+        v[self.board.state.thief] = 1
         return v
 
     def _player_to_vector(self):
@@ -234,60 +314,75 @@ class StrategyNeuralNetwork(Strategy):
     def _feedforward(self, layer: np.array):
         for i, weight in enumerate(self.weights):
             layer = np.dot(weight, layer) + self.biases[i]
-            layer = v_squeeze_function(layer)
+            layer = squeeze_function(layer)
         return layer
 
-    def _backpropagation(self, layer: np.array, answer: float):
+    def astype(self, dtype: np.dtype | type):
+        # float32 halves the memory and speeds up the training
+        self.weights = [weight.astype(dtype) for weight in self.weights]
+        self.biases = [bias.astype(dtype) for bias in self.biases]
+
+    def _backpropagation(self, layers: np.array, answers: np.array):
+        # layers: one input per column, answers: one per column too
+        # Returns the sums of the deltas over the columns
         # feedforward
         neurons = []
-        neurons_squeezed = [layer]
+        neurons_squeezed = [layers]
         for i, weight in enumerate(self.weights):
-            layer = np.dot(weight, layer) + self.biases[i]
-            neurons.append(layer)
-            layer = v_squeeze_function(layer)
-            neurons_squeezed.append(layer)
+            layers = np.dot(weight, layers) + self.biases[i]
+            neurons.append(layers)
+            layers = squeeze_function(layers)
+            neurons_squeezed.append(layers)
 
         # backpropagation
-        delta_neurons = v_squeeze_function_derivative(neurons[-1]) * (np.array([[answer]]) - neurons_squeezed[-1])
+        delta_neurons = squeeze_function_derivative(neurons[-1]) * (answers.reshape(1, -1) - neurons_squeezed[-1])
         delta_weights = [np.dot(delta_neurons, neurons_squeezed[-2].transpose())]
-        delta_biases = [delta_neurons]
+        delta_biases = [delta_neurons.sum(axis=1, keepdims=True)]
 
         for idx in range(2, len(self.layers)):
-            delta_neurons = v_squeeze_function_derivative(neurons[-idx]) * \
+            delta_neurons = squeeze_function_derivative(neurons[-idx]) * \
                             np.dot(self.weights[-idx + 1].transpose(), delta_neurons)
-            delta_biases.insert(0, delta_neurons)
+            delta_biases.insert(0, delta_neurons.sum(axis=1, keepdims=True))
             delta_weights.insert(0, np.dot(delta_neurons, neurons_squeezed[-idx - 1].transpose()))
 
         return delta_weights, delta_biases
 
     def _training_step(self, data: list[tuple[np.array, float]], coef_step: float):
-        delta_weights = [np.zeros(weight.shape) for weight in self.weights]
-        delta_biases = [np.zeros(bias.shape) for bias in self.biases]
-        for layer, answer in data:
-            single_delta_weights, single_delta_biases = self._backpropagation(layer, answer)
-            delta_weights = [delta_weight + single_delta_weight
-                             for delta_weight, single_delta_weight in zip(delta_weights, single_delta_weights)]
-            delta_biases = [delta_bias + single_delta_bias
-                            for delta_bias, single_delta_bias in zip(delta_biases, single_delta_biases)]
-        coef = coef_step / len(data)
+        dtype = self.weights[0].dtype
+        self._training_step_batch(np.hstack([layer for layer, _ in data]).astype(dtype, copy=False),
+                                  np.array([answer for _, answer in data], dtype=dtype), coef_step)
+
+    def _training_step_batch(self, layers: np.array, answers: np.array, coef_step: float):
+        delta_weights, delta_biases = self._backpropagation(layers, answers)
+        coef = coef_step / len(answers)
         self.weights = [weight + coef * delta_weight for weight, delta_weight in zip(self.weights, delta_weights)]
         self.biases = [bias + coef * delta_bias for bias, delta_bias in zip(self.biases, delta_biases)]
 
     def train_network(self, training_data: list[tuple[np.array, float]], list_num_data: list,
-                      list_num_steps: list, list_coef_step: list):
-        shuffle(training_data)
-        num_tot_data = len(training_data)
+                      list_num_steps: list, list_coef_step: list, dtype: np.dtype | type | None = None):
+        if dtype is not None:
+            self.astype(dtype)
+        dtype = self.weights[0].dtype
+        # All the data in one matrix (one column each): the steps take their columns from it
+        layers = np.hstack([layer for layer, _ in training_data]).astype(dtype, copy=False)
+        answers = np.array([answer for _, answer in training_data], dtype=dtype)
+
+        rng = self.board.rng
+        order = list(range(len(training_data)))
+        rng.shuffle(order)
+        num_tot_data = len(order)
         idx = 0
         for num_steps, num_data, coef_step in zip(list_num_steps, list_num_data, list_coef_step):
             for _ in range(num_steps):
                 if idx + num_data > num_tot_data:
-                    step_data = training_data[idx:num_tot_data]
-                    shuffle(training_data)
+                    step_order = order[idx:num_tot_data]
+                    rng.shuffle(order)
                     idx = idx + num_data - num_tot_data
-                    self._training_step(step_data + training_data[0:idx], coef_step)
+                    step_order = step_order + order[0:idx]
                 else:
-                    self._training_step(training_data[idx:idx + num_data], coef_step)
+                    step_order = order[idx:idx + num_data]
                     idx += num_data
+                self._training_step_batch(layers[:, step_order], answers[step_order], coef_step)
 
         # for num_steps, num_data, coef_step in zip(list_num_steps, list_num_data, list_coef_step):
         #     for _ in range(num_steps):
@@ -295,18 +390,27 @@ class StrategyNeuralNetwork(Strategy):
         #         self._training_step(training_data[:num_data], coef_step)
 
     def accuracy(self, training_data: list[tuple[np.array, float]]):
-        mark = 0.
-        for layer, answer in training_data:
-            mark += (float(self._feedforward(layer)) - answer) ** 2
-        return mark ** 0.5 / len(training_data)
+        marks = self._feedforward(np.hstack([layer for layer, _ in training_data]))[0]
+        answers = np.array([answer for _, answer in training_data])
+        return float(np.sum((marks - answers) ** 2)) ** 0.5 / len(training_data)
 
     def inherit(self, parents: list[StrategyNeuralNetwork],
-                proba_mutation: float = 0., mutation_scale: float = 0.):
-        self.weights = [np.array([[float(sum(parent.weights[n][j][i] for parent in parents) / len(parents)) +
-                                   ((2 * random() - 1) * mutation_scale if random() < proba_mutation else 0)
-                                   for i in range(n1)] for j in range(n2)])
-                        for n, (n1, n2) in enumerate(zip(self.layers[:-1], self.layers[1:]))]
-        self.biases = [np.array([[float(sum(parent.biases[i][j] for parent in parents) / len(parents)) +
-                                  ((2 * random() - 1) * mutation_scale if random() < proba_mutation else 0)]
-                                 for j in range(n)])
-                       for i, n in enumerate(self.layers[1:])]
+                proba_mutation: float = 0., mutation_scale: float = 0., rng: np.random.Generator | None = None):
+        if rng is None:
+            rng = self.board.np_rng
+        self.weights = [inherit_array([parent.weights[n] for parent in parents], proba_mutation, mutation_scale, rng)
+                        for n in range(len(self.weights))]
+        self.biases = [inherit_array([parent.biases[n] for parent in parents], proba_mutation, mutation_scale, rng)
+                       for n in range(len(self.biases))]
+
+
+def inherit_array(parents: list[np.array], proba_mutation: float, mutation_scale: float,
+                  rng: np.random.Generator) -> np.array:
+    # The mean of the parents, each value being mutated (uniformly in [-mutation_scale, mutation_scale]) with
+    # the probability proba_mutation
+    array = np.mean(parents, axis=0)
+    mutated = rng.random(array.shape) < proba_mutation
+    num_mutated = np.count_nonzero(mutated)
+    if num_mutated:
+        array[mutated] += rng.uniform(-mutation_scale, mutation_scale, num_mutated)
+    return array
@@ -2,16 +2,21 @@ from __future__ import annotations
 
 from abc import abstractmethod
 from typing import TYPE_CHECKING
+import numpy as np
 
 from logs import log
 from construction import ConstructionKind, NUM_CONSTRUCTION_MAX
 from actions import Action, ActionBuildColony, ActionBuildRoad, ActionBuildTown
 from board import Board
 from tile_intersection import TileIntersection
+from tile_path import TilePath
 from exchange import Exchange, BANK_PLAYER_FOR_EXCHANGE
-from mark_functions_strategy_with_objectives import mark_intersection, mark_objective, mark_tile_thief
-from resource_hand_count import ResourceHandCount
+from mark_functions_strategy_with_objectives import get_intersection_marks, mark_intersection, mark_objective, \
+    mark_objective_for_hands, mark_tile_thief
+from resource_hand_count import ResourceHandCount, hands_to_matrix
 from strategy import Strategy
+from lru_dict import LRUDict
+from road_distances import compute_road_distances, get_roads_to
 
 if TYPE_CHECKING:
     from player import Player
@@ -25,56 +30,53 @@ class Objective:
         self.actions = []
         self.mark = None
 
+    @abstractmethod
+    def get_candidates(self) -> list[tuple[TileIntersection, ResourceHandCount, float]]:
+        # The possible targets with their cost and their gain, which do not depend on the hand of the player
+        pass
+
     @abstractmethod
     def do(self):
         pass
 
+    def _rank_candidates(self) -> TileIntersection | None:
+        rank: dict[TileIntersection, float] = {}
+        m = None
+        for inter, cost, gain in self.get_candidates():
+            rank[inter] = mark_objective(self.player, cost, gain)
+            if m is None or rank[inter] > rank[m]:
+                m = inter
+        if m is not None:
+            self.mark = rank[m]
+        return m
+
 
 # TODO : Add objectives for the longest road and the largest army
 #  And change the mark of the objective leading to victory
 
 
 class ObjectiveBuildColony(Objective):
-    def do(self, particular_starts: list[TileIntersection] = None):
+    def __init__(self, board: Board, player: Player, particular_starts: list[TileIntersection] = None) -> None:
+        Objective.__init__(self, board, player)
+        self.particular_starts = particular_starts
+        self.distances: dict[TileIntersection, int] = {}
+        self.parents: dict[TileIntersection, tuple[TilePath, TileIntersection]] = {}
+
+    def get_candidates(self) -> list[tuple[TileIntersection, ResourceHandCount, float]]:
         # is there remaining colonies to build
         if self.player.num_colonies_belonging_to_player() >= NUM_CONSTRUCTION_MAX[ConstructionKind.COLONY]:
-            return None
-        # find where my roads are
-        starts = particular_starts
-        if starts is None:
-            starts = list(self.player.find_all_intersection_belonging_to_player())
-
-            for path in self.player.find_all_path_belonging_to_player():
-                for inter in path.intersections:
-                    if inter.content is None and inter not in starts:
-                        starts.append(inter)
-
-        distances: dict[TileIntersection, int] = {}
-        for start in starts:
-            distances[start] = 0
-
-        num_roads_max = NUM_CONSTRUCTION_MAX[ConstructionKind.ROAD] - self.player.num_roads_belonging_to_player()
-        q = starts
-        while q:
-            inter = q.pop(0)
-            d = distances[inter] + 1
-            # is there enough remaining roads to build
-            if d > num_roads_max:
-                break
-            for path in inter.neighbour_paths:
-                if path.road_player is not None:
-                    continue
-                for neigh in path.intersections:
-                    if neigh.content is None and neigh not in distances:
-                        distances[neigh] = d
-                        q.append(neigh)
-
-        # rank all intersections
-        # select the best one and do it
-
-        rank: dict[TileIntersection, float] = {}
-        m = None
-        for inter, d in distances.items():
+            return []
+        if self.particular_starts is None:
+            # from where my roads are
+            self.distances = self.player.road_distances.get_distances()
+            self.parents = self.player.road_distances.parents
+        else:
+            num_roads_max = NUM_CONSTRUCTION_MAX[ConstructionKind.ROAD] - \
+                self.player.num_roads_belonging_to_player()
+            self.distances, self.parents = compute_road_distances(self.particular_starts, num_roads_max)
+
+        candidates = []
+        for inter, d in self.distances.items():
             if not inter.can_build():
                 continue
 
@@ -83,64 +85,65 @@ class ObjectiveBuildColony(Objective):
             cost.add(ActionBuildColony.cost)
             for _ in range(d):
                 cost.add(ActionBuildRoad.cost)
+            candidates.append((inter, cost, gain))
+        return candidates
 
-            rank[inter] = mark_objective(self.player, cost, gain)
-            if m is None or rank[inter] > rank[m]:
-                m = inter
+    def do(self):
+        # rank all intersections
+        # select the best one and do it
+        m = self._rank_candidates()
         if m is None:
             return []
-
-        actions: list[Action] = [ActionBuildColony(m, self.player)]
-        curr = m
-        for i in range(distances[m]):
-            for path, inter in curr.neighbour_paths_intersection():
-                if path.road_player is None and inter in distances and distances[inter] == distances[curr] - 1:
-                    actions.insert(0, ActionBuildRoad(path, self.player))
-                    curr = inter
-                    break
-
+        actions: list[Action] = [ActionBuildRoad(path, self.player) for path in get_roads_to(m, self.parents)]
+        actions.append(ActionBuildColony(m, self.player))
         self.actions = actions
-        self.mark = rank[m]
 
 
 class ObjectiveBuildTown(Objective):
-    def do(self):
+    def get_candidates(self) -> list[tuple[TileIntersection, ResourceHandCount, float]]:
         # is there remaining towns to build
         if self.player.num_towns_belonging_to_player() >= NUM_CONSTRUCTION_MAX[ConstructionKind.TOWN]:
-            return None
-        rank: dict[TileIntersection, float] = {}
-        m = None
-        for inter in self.player.find_all_colonies_belonging_to_player():
-            gain = mark_intersection(self.player, inter)
-            cost = ResourceHandCount()
-            cost.add(ActionBuildTown.cost)
-            rank[inter] = mark_objective(self.player, cost, gain)
-            if m is None or rank[inter] > rank[m]:
-                m = inter
+            return []
+        return [(inter, ActionBuildTown.cost, mark_intersection(self.player, inter))
+                for inter in self.player.find_all_colonies_belonging_to_player()]
+
+    def do(self):
+        m = self._rank_candidates()
         if m is None:
             return []
 
         self.actions = [ActionBuildTown(m, self.player)]
-        self.mark = rank[m]
+
+
+NUM_CACHED_BOARD_STATES = 16
+NUM_CACHED_OBJECTIVES = 512
+
+NUM_EXCHANGES_MARKED_MAX = 200
+EXCHANGE_RATIO_MIN = 1 / 4  # Below, the bank is always better
 
 
 class StrategyWithObjectives(Strategy):
+    def __init__(self, board: Board, player: Player):
+        Strategy.__init__(self, board, player)
+        # Keyed on the board state (and the hand): a state comes back often in the same turn, when exchanges
+        # are tried and undone
+        self.candidates_cache: LRUDict[list[tuple[TileIntersection, ResourceHandCount, float]]] = \
+            LRUDict(NUM_CACHED_BOARD_STATES)
+        self.objectives_cache: LRUDict[Objective | None] = LRUDict(NUM_CACHED_OBJECTIVES)
+
+    def change_of_player_and_board(self, board: Board, player: Player):
+        Strategy.change_of_player_and_board(self, board, player)
+        self.candidates_cache.clear()
+        self.objectives_cache.clear()
+
     def place_initial_colony(self):
-        best_mark = 0
-        best_inter = None
-        for inter in self.board.intersections:
-            if not inter.can_build():
-                continue
-            mark = mark_intersection(self.player, inter)
-            if best_inter is None or best_mark < mark:
-                best_inter = inter
-                best_mark = mark
-        return best_inter
+        marks = np.where(self.board.num_close_constructions == 0, get_intersection_marks(self.player), -np.inf)
+        return self.board.intersections[int(np.argmax(marks))]
 
     def place_road_around_initial_colony(self):
         inter = self.player.get_initial_colony_intersection_without_road()
-        obj = ObjectiveBuildColony(self.board, self.player)
-        obj.do(particular_starts=[inter])
+        obj = ObjectiveBuildColony(self.board, self.player, particular_starts=[inter])
+        obj.do()
         assert obj.actions
         action_road = obj.actions[0]
         assert isinstance(action_road, ActionBuildRoad)
@@ -168,19 +171,27 @@ class StrategyWithObjectives(Strategy):
         return True
 
     def remove_cards_thief(self, num_cards_kept: int):
-        best_resource_cards = None
-        best_mark = 0
-        old_hand = self.player.resource_cards
-        for resource_cards in self.player.resource_cards.copy().subsets_of_size_k(num_cards_kept):
-            self.player.resource_cards = resource_cards
-            obj = self._get_objective()
-            mark = 0 if obj is None else obj.mark
-            if best_resource_cards is None or mark > best_mark:
-                best_resource_cards = resource_cards
-                best_mark = mark
-        self.player.resource_cards = old_hand
-        assert best_resource_cards is not None
-        return best_resource_cards
+        hands = self._get_hands_kept_for_thief(num_cards_kept)
+        assert len(hands) > 0
+        marks = self._mark_hands(hands)
+        return ResourceHandCount.from_counts(hands[int(np.argmax(marks))].tolist())
+
+    def _get_hands_kept_for_thief(self, num_cards_kept: int) -> np.ndarray:
+        # We do not give a card needed by the current objective while we can give a card it does not need
+        hand = self.player.resource_cards
+        obj = self._get_objective()
+        if obj is None:
+            return hand.subsets_of_size_k_matrix(num_cards_kept)
+        cost = ResourceHandCount()
+        for action in obj.actions:
+            cost.add(action.cost)
+        needed = ResourceHandCount.from_counts([min(num, count) for num, count in zip(hand.counts, cost.counts)])
+        surplus = ResourceHandCount.from_counts([num - count for num, count in zip(hand.counts, needed.counts)])
+        num_needed = needed.num_resources()
+        if num_needed > num_cards_kept:
+            # All the surplus is given
+            return needed.subsets_of_size_k_matrix(num_cards_kept)
+        return surplus.subsets_of_size_k_matrix(num_cards_kept - num_needed) + np.array(needed.counts)
 
     def move_thief(self):
         best_tile = None
@@ -221,39 +232,72 @@ class StrategyWithObjectives(Strategy):
                     if not cards_useless.try_consume_one(res):
                         cards_needed.add_one(res)
 
-        gains = list(cards_needed.subsets())
+        exchanges = self._get_best_exchanges(cards_useless, cards_needed)
+        if len(exchanges) == 0:
+            return True
+        self.player.propose_exchanges(exchanges)
+        return False
 
-        marked_exchanges: list[tuple[Exchange, float]] = []
+    def _get_best_exchanges(self, cards_useless: ResourceHandCount, cards_needed: ResourceHandCount) -> list[Exchange]:
+        # Only the NUM_EXCHANGES_MARKED_MAX exchanges with the best ratio (cards received / cards given) are marked,
+        # all the ones improving the mark are proposed, best first
+        gains = [(gain, gain.num_resources()) for gain in cards_needed.subsets() if gain.num_resources() > 0]
+        candidates: list[tuple[float, ResourceHandCount, ResourceHandCount]] = []
         for lost in cards_useless.subsets():
-            if lost == ResourceHandCount():
+            num_lost = lost.num_resources()
+            if num_lost == 0:
                 continue
-            for gain in gains:
-                if gain == ResourceHandCount():
-                    continue
-                exchange = Exchange(gain, lost)
-                mark = self._mark_exchange(exchange)
-                if mark > 1:
-                    marked_exchanges.append((exchange, mark))
-
-        if len(marked_exchanges) == 0:
-            return True
-        marked_exchanges.sort(key=lambda x: x[1], reverse=True)
-        self.player.propose_exchanges([exchange for exchange, _ in marked_exchanges])
-        return False
+            for gain, num_gain in gains:
+                ratio = num_gain / num_lost
+                if ratio >= EXCHANGE_RATIO_MIN:
+                    candidates.append((ratio, gain, lost))
+        candidates = sorted(candidates, key=lambda candidate: candidate[0], reverse=True)[:NUM_EXCHANGES_MARKED_MAX]
+        exchanges = [Exchange(gain, lost) for _, gain, lost in candidates]
+        if len(exchanges) == 0:
+            return []
+
+        marked_exchanges = [(mark, exchange) for exchange, mark in zip(exchanges, self._mark_exchanges(exchanges))
+                            if mark > 1]
+        marked_exchanges = sorted(marked_exchanges, key=lambda marked_exchange: marked_exchange[0], reverse=True)
+        return [exchange for _, exchange in marked_exchanges]
 
     def _exchange_with_the_bank(self):
-        best_mark = 1
-        best_exchange = None
-        for exchange in self.player.get_all_possible_exchanges_with_the_bank():
-            mark = self._mark_exchange(exchange)
-            if mark > best_mark:
-                best_mark = mark
-                best_exchange = exchange
-        if best_exchange is None:
+        exchanges = list(self.player.get_all_possible_exchanges_with_the_bank())
+        if len(exchanges) == 0:
+            return False
+        marks = self._mark_exchanges(exchanges)
+        best = int(np.argmax(marks))
+        if not marks[best] > 1:
             return False
-        best_exchange.apply(self.player, BANK_PLAYER_FOR_EXCHANGE)
+        exchanges[best].apply(self.player, BANK_PLAYER_FOR_EXCHANGE)
         return True
 
+    def _mark_hands(self, hands: np.ndarray) -> np.ndarray:
+        # For each hand (one per row), the mark of the objective _get_objective would give with it (0 if none)
+        marks = np.zeros(len(hands))
+        for _, cost, gain in self._get_candidates():
+            marks = np.maximum(marks, mark_objective_for_hands(self.player, cost, gain, hands))
+        return marks
+
+    def _get_candidates(self) -> list[tuple[TileIntersection, ResourceHandCount, float]]:
+        key = self.board.state.get_key()
+        candidates = self.candidates_cache.get(key)
+        if candidates is None:
+            candidates = ObjectiveBuildColony(self.board, self.player).get_candidates() + \
+                ObjectiveBuildTown(self.board, self.player).get_candidates()
+            self.candidates_cache[key] = candidates
+        return candidates
+
+    def _mark_exchanges(self, exchanges: list[Exchange]) -> np.ndarray:
+        # The same as _mark_exchange for all the exchanges at once, which must be possible
+        hand = np.array(self.player.resource_cards.counts)
+        hands = hand - hands_to_matrix([exchange.lost for exchange in exchanges]) + \
+            hands_to_matrix([exchange.gain for exchange in exchanges])
+        marks = self._mark_hands(np.vstack([hand, hands]))
+        if marks[0] == 0:
+            return np.zeros(len(exchanges))  # end of the game...
+        return marks[1:] / marks[0]
+
     def _mark_exchange(self, exchange: Exchange) -> float:
         if not exchange.possible(self.player):
             return 0
@@ -269,6 +313,14 @@ class StrategyWithObjectives(Strategy):
         return self._mark_exchange(exchange) > 1
 
     def _get_objective(self) -> Objective | None:
+        key = (self.board.state.get_key(), self.player.resource_cards.pack())
+        if key in self.objectives_cache:
+            return self.objectives_cache.get(key)
+        obj = self._compute_objective()
+        self.objectives_cache[key] = obj
+        return obj
+
+    def _compute_objective(self) -> Objective | None:
         objs = [ObjectiveBuildColony(self.board, self.player), ObjectiveBuildTown(self.board, self.player)]
         best_obj: Objective | None = None
         for obj in objs:
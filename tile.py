@@ -10,7 +10,9 @@ from tile_intersection import TileIntersection
 
 
 class Tile:
-    def __init__(self, res: Resource, x: int, y: int, dice_number: int, intersections: list[TileIntersection] = None):
+    def __init__(self, res: Resource, x: int, y: int, dice_number: int, intersections: list[TileIntersection] = None,
+                 index: int = 0):
+        self.index = index
         self.resource = res
         self.x = x
         self.y = y
@@ -10,13 +10,17 @@ from probability import get_expectation_of_intersection
 from resource import Resource
 
 if TYPE_CHECKING:
+    from board import Board
     from tile import Tile
     from tile_path import TilePath
 
 
 class TileIntersection:
-    def __init__(self, x: int, y: int, neighbour_paths: list[TilePath] = None, neighbour_tiles: list[Tile] = None):
-        self.content: Construction | None = None
+    def __init__(self, board: Board, index: int, x: int, y: int, neighbour_paths: list[TilePath] = None,
+                 neighbour_tiles: list[Tile] = None):
+        # The content is stored in board.state
+        self.board = board
+        self.index = index
         self.x = x
         self.y = y
         if neighbour_paths is None:
@@ -26,6 +30,14 @@ class TileIntersection:
         self.neighbour_paths = neighbour_paths
         self.neighbour_tiles = neighbour_tiles
 
+    @property
+    def content(self) -> Construction | None:
+        return self.board.get_construction(self)
+
+    @content.setter
+    def content(self, content: Construction | None):
+        self.board.set_construction(self, content)
+
     def add_neighbour_path(self, neighbour_path: TilePath):
         self.neighbour_paths.append(neighbour_path)
 
@@ -46,11 +58,7 @@ class TileIntersection:
         return x, y
 
     def can_build(self):
-        for p in self.neighbour_paths:
-            for t in p.intersections:
-                if t.content is not None:
-                    return False
-        return True
+        return self.board.can_build(self)
 
     def neighbour_tiles_expectation(self):
         return get_expectation_of_intersection(
@@ -10,15 +10,26 @@ from resource_manager import ResourceManager
 from tile_intersection import TileIntersection
 
 if TYPE_CHECKING:
+    from board import Board
     from player import Player
 
 
 class TilePath:
-    def __init__(self, intersections: list[TileIntersection]):
+    def __init__(self, board: Board, index: int, intersections: list[TileIntersection]):
+        # The road is stored in board.state
+        self.board = board
+        self.index = index
         self.intersections = intersections
-        self.road_player: Player | None = None
         self.port: Port | None = None
 
+    @property
+    def road_player(self) -> Player | None:
+        return self.board.get_road_player(self)
+
+    @road_player.setter
+    def road_player(self, player: Player | None):
+        self.board.set_road_player(self, player)
+
     def add_port(self, res: Resource, direction: int):
         self.port = Port(res, direction)
 
@@ -4,7 +4,7 @@ import numpy as np
 from typing import Generator
 from tqdm import tqdm
 import json
-from random import shuffle, choices
+import random
 import matplotlib.pyplot as plt
 
 from constants import NUM_VICTORY_POINTS_FOR_VICTORY
@@ -12,14 +12,16 @@ from game import Game
 from game_states import GameState
 from strategy import Strategy
 from strategy_neural_network import StrategyNeuralNetwork
+from neural_network_population import NeuralNetworkPopulation
 from strategy_with_objectives import StrategyWithObjectives
 from player import Player
 from ia_player import IaPlayer
 
 
-def generate_infinite_training_data() -> Generator[tuple[np.array, float]]:
+def generate_infinite_training_data(seed: int | None = None) -> Generator[tuple[np.array, float]]:
+    rng = random.Random(seed)
     while True:
-        game = Game(["Network 1", "Network 2", "ObjStrategy 1", "ObjStrategy 2"])
+        game = Game(["Network 1", "Network 2", "ObjStrategy 1", "ObjStrategy 2"], rng.randrange(2 ** 32))
         strategies_network: dict[Player, StrategyNeuralNetwork] = {
             player: StrategyNeuralNetwork(game.board, player) for player in game.players
         }
@@ -41,8 +43,8 @@ def generate_infinite_training_data() -> Generator[tuple[np.array, float]]:
                     player.num_victory_points() / NUM_VICTORY_POINTS_FOR_VICTORY))
 
 
-def create_training_data(num_data: int) -> list[tuple[np.array, float]]:
-    generator = generate_infinite_training_data()
+def create_training_data(num_data: int, seed: int | None = None) -> list[tuple[np.array, float]]:
+    generator = generate_infinite_training_data(seed)
     return [next(generator) for _ in tqdm(range(num_data))]
 
 
@@ -58,9 +60,11 @@ def load_training_data(path: str) -> list[tuple[np.array, float]]:
 
 
 class Training:
-    game_temp = Game(["A", "B", "C", "D"])
+    def __init__(self, strategies_networks: list[StrategyNeuralNetwork] | int | str = 60, seed: int | None = None):
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(self.rng.randrange(2 ** 32))
+        self.game_temp = Game(["A", "B", "C", "D"], self.rng.randrange(2 ** 32))
 
-    def __init__(self, strategies_networks: list[StrategyNeuralNetwork] | int | str = 60):
         self.strategies_networks: list[StrategyNeuralNetwork]
         if isinstance(strategies_networks, int):
             self.strategies_networks = [StrategyNeuralNetwork(self.game_temp.board, self.game_temp.players[0])
@@ -75,12 +79,10 @@ class Training:
     def load_strategies(self, path: str) -> list[StrategyNeuralNetwork]:
         with open(path, "r") as file:
             params_list = json.load(file)
-        strategies_networks = []
-        for i in range(len(params_list)):
-            network = StrategyNeuralNetwork(self.game_temp.board, self.game_temp.players[0])
-            network.from_list_network(params_list[i])
-            strategies_networks.append(network)
-        return strategies_networks
+        return [StrategyNeuralNetwork(self.game_temp.board, self.game_temp.players[0],
+                                      [np.array(weight) for weight in params[0]],
+                                      [np.array(bias) for bias in params[1]])
+                for params in params_list]
 
     def save_strategies(self, path: str):
         with open(path, "w") as file:
@@ -90,7 +92,7 @@ class Training:
         training_data: list[tuple[np.array, float]]
         if isinstance(training_data, int):
             print("Create training data:")
-            training_data = create_training_data(training_data)
+            training_data = create_training_data(training_data, self.rng.randrange(2 ** 32))
         elif isinstance(training_data, str):
             print("Load training data:")
             training_data = load_training_data(training_data)
@@ -98,18 +100,21 @@ class Training:
             training_data = training_data
 
         print("Train the neural networks:")
-        for i in tqdm(range(len(self.strategies_networks))):
-            # strategy_neural_network.train_network(training_data, [10, 50, 100], [2000, 200, 120], [5, 10, 15])
-            self.strategies_networks[i].train_network(training_data, [10], [2000], [5])
+        population = NeuralNetworkPopulation.from_networks(self.strategies_networks)
+        # population.train(training_data, [10, 50, 100], [2000, 200, 120], [5, 10, 15], self.np_rng)
+        population.train(training_data, [10], [2000], [5], self.np_rng)
+        self.strategies_networks = population.to_networks(self.game_temp.board, self.game_temp.players[0])
 
-    def mark_strategies_networks(self, num_games_per_network: int, num_turns_max: int = 30,
+    def mark_strategies_networks(self, num_games_per_network: int, num_turns_max: int = 32,
                                  num_victory_points_min: int = 2):
+        # Each game stops after num_turns_max turns (of any player) after the placement of the initial colonies:
+        # 32 turns is about the horizon of the former limit of 120 calls to Game.play (turn 40 to 42)
         order = list(range(0, len(self.strategies_networks)))
         marks = np.zeros(len(self.strategies_networks))
         for _ in tqdm(range(num_games_per_network)):
-            shuffle(order)
+            self.rng.shuffle(order)
             for i in range(len(self.strategies_networks) // 4):
-                game = Game(["A", "B", "C", "D"])
+                game = Game(["A", "B", "C", "D"], self.rng.randrange(2 ** 32))
 
                 player_managers: dict[Player, IaPlayer] = {
                     player: IaPlayer(player, self.strategies_networks[order[4 * i + j]])
@@ -121,10 +126,8 @@ class Training:
                     strategy.change_of_player_and_board(game.board, player)
                     player_managers[player] = IaPlayer(player, strategy)
 
-                for _ in range(4 * num_turns_max):
-                    game.play(player_managers)
-                    if game.end_game():
-                        break
+                # The 2 first turns of each player are for placing the initial colonies
+                game.run_to_end(player_managers, num_turns_max=2 * len(game.players) + num_turns_max)
 
                 for j, player in enumerate(game.players):
                     n = player.num_victory_points(without_longest_road_and_largest_army=True)
@@ -140,19 +143,22 @@ class Training:
         return marks
 
     def compose_new_generation(self, weights: np.array) -> list[StrategyNeuralNetwork]:
-        new_generation = []
+        parents: list[list[int]] = []
+        probas_mutation: list[float] = []
+        mutation_scales: list[float] = []
         for num_descendants, proba, mutation in [
             (20, 0.02, 0.0001),
             (20, 0.002, 0.001),
             (20, 0.0002, 0.01)
         ]:
             for _ in range(num_descendants):
-                num_parents = choices([1, 2, 3], [0.9, 0.08, 0.02], k=1)[0]
-                network = StrategyNeuralNetwork(self.game_temp.board, self.game_temp.players[0])
-                parents = choices(self.strategies_networks, weights, k=num_parents)
-                network.inherit(parents, proba, mutation)
-                new_generation.append(network)
-        return new_generation
+                num_parents = self.rng.choices([1, 2, 3], [0.9, 0.08, 0.02], k=1)[0]
+                parents.append(self.rng.choices(range(len(self.strategies_networks)), weights, k=num_parents))
+                probas_mutation.append(proba)
+                mutation_scales.append(mutation)
+        population = NeuralNetworkPopulation.from_networks(self.strategies_networks)
+        new_population = population.inherit(parents, probas_mutation, mutation_scales, self.np_rng)
+        return new_population.to_networks(self.game_temp.board, self.game_temp.players[0])
 
     def train_generation(self, num_generations: int = 100, num_games_per_network: int = 50,
                          save_generations: bool = False, matplotlib_figs: bool = False):
@@ -184,7 +190,6 @@ class Training:
 
 
 if __name__ == "__main__":
-    # random.seed(1)
 
     # print("Creation of the training data:")
     # training_data = create_training_data(50_000)